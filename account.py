@@ -0,0 +1,50 @@
+from sqlalchemy.orm import joinedload, load_only
+
+from models import Booking, Referral, Service
+from pagination import keyset_page
+
+
+def booking_history(user_id, cursor=None, limit=20):
+    """A page of a user's bookings, most recent date first.
+
+    Only the columns the dashboard and profile show are loaded, and each
+    booking's service name comes in on the same query.
+    """
+    query = (
+        Booking.query
+        .options(
+            load_only(Booking.id, Booking.date, Booking.time, Booking.status, Booking.service_id),
+            joinedload(Booking.service).load_only(Service.id, Service.name),
+        )
+        .filter(Booking.user_id == user_id)
+    )
+    return keyset_page(query, Booking.date, Booking.id, cursor, limit)
+
+
+def referral_history(user_id, cursor=None, limit=20):
+    """A page of the referrals a user has made, newest first."""
+    query = (
+        Referral.query
+        .options(load_only(Referral.id, Referral.referred_email, Referral.date_referred, Referral.status))
+        .filter(Referral.referrer_id == user_id)
+    )
+    return keyset_page(query, Referral.date_referred, Referral.id, cursor, limit)
+
+
+def booking_to_dict(booking):
+    return {
+        'id': booking.id,
+        'service': booking.service.name if booking.service else None,
+        'date': booking.date.isoformat() if booking.date else None,
+        'time': booking.time.strftime('%H:%M') if booking.time else None,
+        'status': booking.status,
+    }
+
+
+def referral_to_dict(referral):
+    return {
+        'id': referral.id,
+        'referred_email': referral.referred_email,
+        'date_referred': referral.date_referred.isoformat() if referral.date_referred else None,
+        'status': referral.status,
+    }
@@ -0,0 +1,87 @@
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from metrics import metrics
+
+tool_seconds = metrics.histogram('chat_tool_duration_seconds', 'Time to run one chat tool call, by tool.', ('tool',))
+
+
+class ToolRunner:
+    """Runs the tool calls of one model turn on a shared thread pool.
+
+    Swarm would otherwise execute them one after another inside its stream
+    generator, leaving the chat silent until the last one returns. Here all
+    calls of a turn are submitted at once, each inside its own app context,
+    and results are reported in completion order.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CHAT_TOOL_WORKERS', 8)
+        self.app = app
+        app.extensions['agent_tools'] = self
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.app.config['CHAT_TOOL_WORKERS'],
+                                                thread_name_prefix='agent-tool')
+        return self._executor
+
+    def _call(self, function, arguments):
+        with self.app.app_context(), tool_seconds.time(tool=function.__name__):
+            result = function(**arguments)
+        if isinstance(result, str):
+            return result
+        try:
+            return json.dumps(result)
+        except TypeError:
+            return str(result)
+
+    def run(self, tool_calls, functions):
+        """Submit every call and yield ('started' | 'finished', call, result) tuples.
+
+        `tool_calls` are the dicts Swarm records on the assistant message and
+        `functions` maps tool names to callables.
+        """
+        futures = {}
+        started = []
+        failed = []
+        # Everything is submitted before the first yield, so closing this
+        # generator early never leaves some calls of the turn unstarted.
+        for tool_call in tool_calls:
+            name = tool_call["function"]["name"]
+            function = functions.get(name)
+            try:
+                arguments = json.loads(tool_call["function"].get("arguments") or "{}")
+            except ValueError:
+                arguments = None
+            started.append((tool_call, arguments))
+            if function is None:
+                failed.append((tool_call, f"Error: Tool {name} not found."))
+            elif arguments is None:
+                failed.append((tool_call, f"Error: Invalid arguments for {name}."))
+            else:
+                futures[self.executor.submit(self._call, function, arguments)] = tool_call
+
+        for tool_call, arguments in started:
+            yield 'started', tool_call, arguments
+        for tool_call, result in failed:
+            yield 'finished', tool_call, result
+        for future in as_completed(futures):
+            tool_call = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                name = tool_call['function']['name']
+                self.app.logger.error(f"Error in {name}: {str(e)}")
+                result = f"An error occurred while running {name}."
+            yield 'finished', tool_call, result
+
+
+agent_tools = ToolRunner()
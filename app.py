@@ -1,41 +1,62 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, render_template_string, current_app
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, render_template_string, current_app, session
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 from extensions import db, login_manager, mail
-from flask_mail import Message
 from models import User, Service, Booking, Contact, Referral, Feedback, LoyaltyPoints
 import random
 import string
-from openai import OpenAI
-from swarm import Agent, Swarm
+import uuid
 import json
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import time
 from contextlib import contextmanager
-from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import timedelta
 from flask_migrate import Migrate
-from tools.custom_tool import check_availability, calculate_estimate, send_confirmation_email
-
-# Get the directory of the current script
-current_dir = os.path.dirname(os.path.abspath(__file__))
-# Construct the path to the .env file
-env_path = os.path.join(current_dir, '.env')
-# Load the .env file
-load_dotenv(dotenv_path=env_path)
-
-print("OPENAI_API_KEY:", os.getenv('OPENAI_API_KEY'))
-
-print("Current directory:", current_dir)
-print("Env file path:", env_path)
-print("Env file exists:", os.path.exists(env_path))
-print("Env file contents:")
-with open(env_path, 'r') as f:
-    print(f.read())
+from tools.custom_tool import check_availability, calculate_estimate, quote_services, send_confirmation_email
+from availability import availability_index
+from service_catalog import service_catalog
+from quotes import quote_engine
+from bookings import create_bookings, idempotency_keys, parse_date, parse_time
+from mail_queue import mail_queue
+from follow_ups import follow_ups
+from chat_sessions import chat_sessions, BOOKING_AGENT, GENERAL_AGENT
+from chat_stream import event, replay, with_heartbeats, NDJSON_MIMETYPE, STREAM_HEADERS
+from chat_cache import chat_cache
+from chat_admission import chat_admission, Overloaded
+from agent_tools import agent_tools
+from chat_compaction import chat_compaction
+from identity_cache import identity_cache
+from passwords import password_hasher, HashingBusy
+from images import image_manifest
+from page_cache import page_cache
+from account import booking_history, referral_history, booking_to_dict, referral_to_dict
+from pagination import InvalidCursor
+from loyalty import loyalty_ledger
+from ratings import rating_rollups, parse_rating
+from ingest import write_behind
+from db_profile import engine_profile, read_only
+from chat_agents import chat_agents, first_token_seconds, turn_seconds
+from background_jobs import background_jobs
+from metrics import metrics
+
+# Load the .env file next to this script
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+FAQS = [
+    {
+        'question': 'What areas do you serve?',
+        'answer': 'We currently serve the greater metropolitan area and surrounding suburbs.'
+    },
+    {
+        'question': 'How do I schedule a service?',
+        'answer': 'You can easily schedule a service through our online booking system or by calling our customer service line.'
+    },
+    {
+        'question': 'What is your cancellation policy?',
+        'answer': 'We offer free cancellation up to 24 hours before your scheduled service.'
+    },
+    # Add more FAQs as needed
+]
 
 def create_app():
     app = Flask(__name__)
@@ -43,6 +64,13 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///new_bookings.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Database engine profile: 'production' (WAL, pooled, read pool) or 'basic'
+    app.config['DB_ENGINE_PROFILE'] = os.getenv('DB_ENGINE_PROFILE', 'production')
+    app.config['DATABASE_READ_URL'] = os.getenv('DATABASE_READ_URL')
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 10))
+    app.config['DB_READ_POOL_SIZE'] = int(os.getenv('DB_READ_POOL_SIZE', 20))
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
     # Email configuration
     app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
     app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
@@ -51,44 +79,109 @@ def create_app():
     app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
     app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', 'noreply@marquisesservices.com')
 
+    # Password hashing configuration
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    app.config['PASSWORD_HASH_POOL'] = os.getenv('PASSWORD_HASH_POOL', 'thread')
+
+    # Chat configuration
+    app.config['CHAT_HEARTBEAT_SECONDS'] = int(os.getenv('CHAT_HEARTBEAT_SECONDS', 15))
+    # Per worker process; see gunicorn.conf.py for how this sizes against GUNICORN_THREADS.
+    app.config['CHAT_MAX_STREAMS'] = int(os.getenv('CHAT_MAX_STREAMS', 32))
+    app.config['CHAT_MAX_QUEUED'] = int(os.getenv('CHAT_MAX_QUEUED', 64))
+    app.config['CHAT_MAX_TOOL_ROUNDS'] = int(os.getenv('CHAT_MAX_TOOL_ROUNDS', 5))
+    app.config['CHAT_HISTORY_TOKEN_BUDGET'] = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', 1500))
+
+    # Write-behind ingestion of contact and feedback forms
+    app.config['INGEST_DURABILITY'] = os.getenv('INGEST_DURABILITY', 'log')
+
+    # /metrics bearer token, and the opt-in slow request log (0 = off)
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+    app.config['METRICS_ALLOWED_IPS'] = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+    app.config['METRICS_SLOW_REQUEST_MS'] = int(os.getenv('METRICS_SLOW_REQUEST_MS', 0)) or None
+
+    # Dashboard/profile history pages
+    app.config['ACCOUNT_PAGE_SIZE'] = int(os.getenv('ACCOUNT_PAGE_SIZE', 20))
+    app.config['ACCOUNT_MAX_PAGE_SIZE'] = int(os.getenv('ACCOUNT_MAX_PAGE_SIZE', 100))
+
+    engine_profile.init_app(app)
     db.init_app(app)
+    metrics.init_app(app)
     login_manager.init_app(app)
     mail.init_app(app)
+    chat_admission.init_app(app)
+    chat_cache.init_app(app)
+    agent_tools.init_app(app)
+    chat_compaction.init_app(app)
+    for faq in FAQS:
+        chat_cache.seed(faq['question'], faq['answer'])
+    service_catalog.init_app(app)
+    quote_engine.init_app(app)
+    availability_index.init_app(app)
+    identity_cache.init_app(app)
+    password_hasher.init_app(app)
+    image_manifest.init_app(app)
+    page_cache.init_app(app)
+    write_behind.init_app(app)
     
     # Initialize Flask-Migrate
-    migrate = Migrate(app, db)
+    # SQLite can only ALTER by copying the table, hence batch mode.
+    migrate = Migrate(app, db, render_as_batch=True)
 
     login_manager.login_view = 'login'
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return identity_cache.load(int(user_id))
 
     @app.route('/')
+    @page_cache.cached
     def index():
         return render_template('index.html')
 
     @app.route('/services')
+    @page_cache.cached
     def services():
-        return render_template('services.html')
+        return render_template('services.html', ratings=rating_rollups.by_service_name())
 
     @app.route('/about')
+    @page_cache.cached
     def about():
         return render_template('about.html')
 
     @app.route('/testimonials')
+    @page_cache.cached
     def testimonials():
-        return render_template('testimonials.html')
+        return render_template('testimonials.html', ratings=rating_rollups.summaries())
+
+    # Contact and feedback posts are buffered and group-committed by
+    # write_behind; these turn one buffered submission into rows.
+    def ingest_contact(payload):
+        db.session.add(Contact(name=payload['name'], email=payload['email'], message=payload['message'],
+                               date_submitted=datetime.fromisoformat(payload['date_submitted'])))
+
+    def ingest_feedback(payload):
+        new_feedback = Feedback(user_id=payload['user_id'], service_id=payload['service_id'],
+                                rating=payload['rating'], comment=payload['comment'],
+                                date_submitted=datetime.fromisoformat(payload['date_submitted']))
+        db.session.add(new_feedback)
+        rating_rollups.record(new_feedback)
+
+    def feedback_committed():
+        page_cache.invalidate('testimonials')
+        page_cache.invalidate('services')
+
+    write_behind.register('contact', ingest_contact)
+    write_behind.register('feedback', ingest_feedback, after_commit=feedback_committed)
 
     @app.route('/contact', methods=['GET', 'POST'])
     def contact():
         if request.method == 'POST':
-            name = request.form['name']
-            email = request.form['email']
-            message = request.form['message']
-            new_contact = Contact(name=name, email=email, message=message)
-            db.session.add(new_contact)
-            db.session.commit()
+            write_behind.submit('contact', {
+                'name': request.form['name'],
+                'email': request.form['email'],
+                'message': request.form['message'],
+                'date_submitted': datetime.utcnow().isoformat(),
+            })
             flash('Your message has been sent!', 'success')
             return redirect(url_for('contact'))
         return render_template('contact.html')
@@ -104,8 +197,21 @@ def create_app():
             remember = True if request.form.get('remember') else False
             
             user = User.query.filter_by(email=email).first()
+
+            try:
+                valid = user is not None and password_hasher.check(user.password, password)
+            except HashingBusy as e:
+                flash(str(e), 'warning')
+                return render_template('login.html'), 503
             
-            if user and check_password_hash(user.password, password):
+            if valid:
+                # Upgrade hashes made with older or cheaper settings.
+                if password_hasher.needs_rehash(user.password):
+                    try:
+                        user.password = password_hasher.generate(password)
+                        db.session.commit()
+                    except HashingBusy:
+                        pass
                 login_user(user, remember=remember)
                 next_page = request.args.get('next')
                 return redirect(next_page or url_for('index'))
@@ -135,7 +241,11 @@ def create_app():
                 return redirect(url_for('register'))
 
             new_user = User(username=username, email=email)
-            new_user.password = generate_password_hash(password)
+            try:
+                new_user.password = password_hasher.generate(password)
+            except HashingBusy as e:
+                flash(str(e), 'warning')
+                return redirect(url_for('register'))
             db.session.add(new_user)
             db.session.commit()
 
@@ -150,145 +260,188 @@ def create_app():
         logout_user()
         return redirect(url_for('index'))
 
+    def page_limit():
+        limit = request.args.get('limit', type=int) or app.config['ACCOUNT_PAGE_SIZE']
+        return max(1, min(limit, app.config['ACCOUNT_MAX_PAGE_SIZE']))
+
     @app.route('/profile')
     @login_required
     def profile():
-        bookings = Booking.query.filter_by(user_id=current_user.id).all()
-        return render_template('profile.html', bookings=bookings)
+        try:
+            bookings = booking_history(current_user.id, request.args.get('cursor'), page_limit())
+        except InvalidCursor:
+            return redirect(url_for('profile'))
+        return render_template('profile.html', bookings=bookings.items, next_cursor=bookings.next_cursor)
 
     @app.route('/booking', methods=['GET', 'POST'])
     def booking():
-        services = Service.query.all()
         if request.method == 'POST':
             service_ids = request.form.getlist('services')
             email = request.form['email']
             date = request.form['date']
             time = request.form['custom-time']
             duration = request.form['duration']
-            
-            for service_id in service_ids:
-                service = Service.query.get(service_id)
-                new_booking = Booking(service=service.name, email=email, date=date, time=time)
-                # Only set user_id if the user is logged in
-                if current_user.is_authenticated:
-                    new_booking.user_id = current_user.id
-                db.session.add(new_booking)
-            
-            db.session.commit()
-            
+
+            if not service_ids:
+                flash('Please select at least one service.', 'danger')
+                return redirect(url_for('booking'))
+
+            idempotency_key = (request.form.get('idempotency_key') or '')[:64] or None
+            # Only set user_id if the user is logged in
+            user_id = current_user.id if current_user.is_authenticated else None
+            try:
+                new_bookings, created = create_bookings(service_ids, email, date, time, user_id, idempotency_key)
+            except ValueError as e:
+                flash(str(e), 'danger')
+                return redirect(url_for('booking'))
+
+            if not created:
+                flash('This booking was already received.', 'info')
+                return redirect(url_for('confirmation'))
+
             try:
-                send_confirmation_email(email, [Service.query.get(id).name for id in service_ids], date, time)
+                send_confirmation_email(email, [service_catalog.get(b.service_id).name for b in new_bookings], date, time)
                 flash('Booking successful! A confirmation email has been sent.', 'success')
             except Exception as e:
                 app.logger.error(f"Failed to send email: {str(e)}")
                 flash('Booking successful! Please check your email for confirmation details.', 'success')
             
             return redirect(url_for('confirmation'))
+        services = service_catalog.all()
         user_email = current_user.email if current_user.is_authenticated else ''
-        return render_template('booking.html', services=services, user_email=user_email)
+        return render_template('booking.html', services=services, user_email=user_email,
+                               idempotency_key=uuid.uuid4().hex)
 
     @app.route('/confirmation')
     def confirmation():
         return render_template('confirmation.html')
 
     @app.route('/faq')
+    @page_cache.cached
     def faq():
-        faqs = [
-            {
-                'question': 'What areas do you serve?',
-                'answer': 'We currently serve the greater metropolitan area and surrounding suburbs.'
-            },
-            {
-                'question': 'How do I schedule a service?',
-                'answer': 'You can easily schedule a service through our online booking system or by calling our customer service line.'
-            },
-            {
-                'question': 'What is your cancellation policy?',
-                'answer': 'We offer free cancellation up to 24 hours before your scheduled service.'
-            },
-            # Add more FAQs as needed
-        ]
-        return render_template('faq.html', faqs=faqs)
+        return render_template('faq.html', faqs=FAQS)
 
     @app.route('/gallery')
+    @page_cache.cached
     def gallery():
-        gallery_images = [
-            {'src': 'images/job1.jpg', 'alt': 'Moving Service Example', 'category': 'Moving'},
-            {'src': 'images/job2.jpg', 'alt': 'Cleaning Service Example', 'category': 'Cleaning'},
-            {'src': 'images/job3.jpg', 'alt': 'Handyman Service Example', 'category': 'Handyman'},
-            # Add more images here
-        ]
+        gallery_images = image_manifest.gallery()
         return render_template('gallery.html', gallery_images=gallery_images)
 
     @app.route('/dashboard')
     @login_required
     def dashboard():
-        user_bookings = Booking.query.filter_by(user_id=current_user.id).all()
-        user_referrals = Referral.query.filter_by(referrer_id=current_user.id).all()
-        return render_template('dashboard.html', bookings=user_bookings, referrals=user_referrals)
+        try:
+            bookings = booking_history(current_user.id, request.args.get('bookings_cursor'), page_limit())
+            referrals = referral_history(current_user.id, request.args.get('referrals_cursor'), page_limit())
+        except InvalidCursor:
+            return redirect(url_for('dashboard'))
+        return render_template('dashboard.html', bookings=bookings.items, referrals=referrals.items,
+                               bookings_cursor=bookings.next_cursor, referrals_cursor=referrals.next_cursor)
+
+    @app.route('/dashboard/bookings')
+    @login_required
+    def dashboard_bookings():
+        try:
+            page = booking_history(current_user.id, request.args.get('cursor'), page_limit())
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'items': [booking_to_dict(b) for b in page.items], 'next_cursor': page.next_cursor})
+
+    @app.route('/dashboard/referrals')
+    @login_required
+    def dashboard_referrals():
+        try:
+            page = referral_history(current_user.id, request.args.get('cursor'), page_limit())
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'items': [referral_to_dict(r) for r in page.items], 'next_cursor': page.next_cursor})
 
     @app.route('/check_availability', methods=['POST'])
+    @read_only
     def check_availability():
-        service = request.form['service']
+        services = request.form.getlist('services[]') or request.form.getlist('services') or request.form.getlist('service')
         date = request.form['date']
-        time = request.form['time']
-        # Implement your availability checking logic here
-        # This is a placeholder response
-        available = True
-        return jsonify({'available': available})
+        time = request.form.get('time')
+        try:
+            results = {str(service): availability_index.is_available(service, date, time) for service in services}
+        except ValueError:
+            return jsonify({'error': 'Invalid date, expected YYYY-MM-DD'}), 400
+        available = bool(results) and all(results.values())
+        return jsonify({'available': available, 'services': results})
+
+    @app.route('/availability/<service>')
+    def availability_calendar(service):
+        days = min(request.args.get('days', 30, type=int), 60)
+        try:
+            calendar = availability_index.calendar(service, request.args.get('start'), days)
+        except ValueError:
+            return jsonify({'error': 'Invalid start date, expected YYYY-MM-DD'}), 400
+        if calendar is None:
+            return jsonify({'error': f'Service {service} not found'}), 404
+        return jsonify({'service': service, 'days': calendar})
+
+    @app.route('/quote')
+    def quote():
+        services = request.args.getlist('services') or request.args.getlist('service')
+        hours = [value for value in request.args.get('hours', '').split(',') if value.strip()]
+        days = min(request.args.get('days', 7, type=int), app.config['QUOTE_MAX_DAYS'])
+        try:
+            dates = quote_engine.date_range(request.args.get('start'), days)
+            return jsonify(quote_engine.quote(services, dates, hours or None))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
     def send_email(to, subject, body):
-        """Send an email using the configured mail server."""
-        sender_email = current_app.config['MAIL_USERNAME']
-        sender_password = current_app.config['MAIL_PASSWORD']
-        mail_server = current_app.config['MAIL_SERVER']
-        mail_port = current_app.config['MAIL_PORT']
-
-        print(f"Attempting to send email from {sender_email} to {to}")
-        
-        if not sender_email or not sender_password:
-            return json.dumps({"status": "error", "message": "Email credentials not found in configuration"})
-
-        message = MIMEMultipart()
-        message["From"] = sender_email
-        message["To"] = to
-        message["Subject"] = subject
-        message.attach(MIMEText(body, "plain"))
-
+        """Queue a plain-text email for delivery by the mail queue workers."""
         try:
-            with smtplib.SMTP(mail_server, mail_port) as server:
-                server.starttls()
-                server.login(sender_email, sender_password)
-                server.send_message(message)
-            return json.dumps({"status": "success", "message": "Email sent successfully!"})
+            mail_queue.enqueue(subject, [to], body=body)
+            return json.dumps({"status": "success", "message": "Email queued for delivery."})
         except Exception as e:
+            db.session.rollback()
             error_message = f"An error occurred: {str(e)}"
-            print(error_message)
+            app.logger.error(error_message)
             return json.dumps({"status": "error", "message": error_message})
 
-    # Initialize the scheduler
-    scheduler = BackgroundScheduler()
-    scheduler.start()
+    # Periodic jobs start with the first request in each process; reminder
+    # and feedback emails are derived from Booking rows by a single
+    # leader-elected sweep job.
+    background_jobs.init_app(app)
+    mail_queue.init_app(app, background_jobs)
+    follow_ups.init_app(app, background_jobs)
+    chat_sessions.init_app(app, background_jobs)
+    idempotency_keys.init_app(app, background_jobs)
+    loyalty_ledger.init_app(app, background_jobs)
+    rating_rollups.init_app(app, background_jobs)
+
+    # Queue depths and cache counters, read whenever /metrics is scraped
+    metrics.callback('mail_queue_depth', 'Outbound emails not yet sent, by status.', mail_queue.depth, ('status',))
+    metrics.callback('write_behind_pending', 'Contact and feedback posts buffered but not yet committed.',
+                     lambda: write_behind.pending)
+    metrics.callback('scheduler_job_lag_seconds', 'How far each periodic job is behind its schedule.',
+                     background_jobs.lag, ('job',))
+    metrics.callback('chat_streams_active', 'Chat responses currently streaming.', lambda: chat_admission.active)
+    metrics.callback('chat_streams_waiting', 'Chat requests queued for a stream slot.', lambda: chat_admission.waiting)
+    for name, cache in (('page', page_cache), ('identity', identity_cache), ('chat', chat_cache)):
+        metrics.callback(f'{name}_cache_lookups_total', f'{name.capitalize()} cache lookups, by result.',
+                         lambda cache=cache: {('hit',): cache.hits, ('miss',): cache.misses}, ('result',),
+                         type='counter')
 
     def book_service(service, email, date, time):
         """Book a service and save it to the database."""
         try:
             with app.app_context():
-                new_booking = Booking(service=service, email=email, date=date, time=time)
+                service_row = service_catalog.find(service)
+                if service_row is None:
+                    return f"Service '{service}' not found."
+                new_booking = Booking(service_id=service_row.id, email=email, date=parse_date(date), time=parse_time(time))
                 db.session.add(new_booking)
+
+                # Loyalty points are recorded in the same transaction as the booking
+                user_id = db.session.query(User.id).filter_by(email=email).scalar()
+                if user_id:
+                    loyalty_ledger.award_booking(user_id, new_booking)
                 db.session.commit()
                 
-                # Add loyalty points
-                user = User.query.filter_by(email=email).first()
-                if user:
-                    loyalty_points = LoyaltyPoints.query.filter_by(user_id=user.id).first()
-                    if not loyalty_points:
-                        loyalty_points = LoyaltyPoints(user_id=user.id)
-                    loyalty_points.points += 100  # Add 100 points for each booking
-                    loyalty_points.last_updated = datetime.utcnow()
-                    db.session.add(loyalty_points)
-                    db.session.commit()
-                
                 # Send confirmation email
                 confirmation_result = send_confirmation_email(email, [service], date, time)
                 
@@ -306,160 +459,223 @@ def create_app():
             html_content = render_template('email_templates/booking_confirmation.html', 
                                            services=services, date=date, time=time)
             
-            msg = Message(subject, recipients=[email], html=html_content)
-            mail.send(msg)
-            
-            # Schedule follow-up emails
-            schedule_follow_up_emails(email, services, date, time)
+            mail_queue.enqueue(subject, [email], html=html_content)
             
             return f"Confirmation email sent to {email} for services on {date} at {time}."
         except Exception as e:
             print(f"Failed to send email: {str(e)}")  # Log the error
             return "Booking confirmed. You'll receive a confirmation email shortly."
 
-    def schedule_follow_up_emails(email, services, date, time):
-        # Schedule reminder email 1 day before the service
-        reminder_date = datetime.strptime(date, "%Y-%m-%d") - timedelta(days=1)
-        scheduler.add_job(send_reminder_email, 'date', run_date=reminder_date, args=[email, services, date, time])
-        
-        # Schedule feedback request email 1 day after the service
-        feedback_date = datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1)
-        scheduler.add_job(send_feedback_request, 'date', run_date=feedback_date, args=[email, services])
-
-    def send_reminder_email(email, services, date, time):
-        subject = "Your Marquise's Services Appointment Tomorrow"
-        html_content = render_template('email_templates/reminder_email.html', 
-                                       services=services, date=date, time=time)
-        msg = Message(subject, recipients=[email], html=html_content)
-        mail.send(msg)
-
-    def send_feedback_request(email, services):
-        subject = "How was your Marquise's Services experience?"
-        feedback_url = url_for('feedback', _external=True)
-        html_content = render_template('email_templates/feedback_request.html', 
-                                       services=services, feedback_url=feedback_url)
-        msg = Message(subject, recipients=[email], html=html_content)
-        mail.send(msg)
-
-    booking_agent = Agent(
-        name="Marquise's Elite Booking Specialist",
-        instructions="""
-        You are an elite booking specialist for Marquise's Services, providing world-class customer service comparable to Fortune 500 companies. Your goal is to assist customers in booking appointments for moving, cleaning, or handyman services with utmost professionalism and attention to detail.
-
-        Follow these steps:
-        1. Greet the customer warmly and ask how you can assist them today.
-        2. If they're interested in booking, ask which service they need (moving, cleaning, or handyman).
-        3. Ask for their preferred date.
-        4. Ask for their preferred time.
-        5. Collect their email address for booking confirmation and follow-up communications.
-        6. Summarize the booking details and confirm if everything is correct.
-        7. Use the book_service function to finalize the booking.
-        8. After booking, inform the customer about the confirmation email they'll receive.
-        9. Ask if there's anything else you can assist them with, such as special requests or additional information about the service.
-
-        Throughout the conversation:
-        - Maintain a polite, professional, and friendly demeanor.
-        - Use the customer's name if provided.
-        - Offer personalized suggestions based on the service they're booking.
-        - Address any concerns or questions promptly and thoroughly.
-        - Highlight the unique benefits of choosing Marquise's Services.
-        - If appropriate, mention any current promotions or loyalty programs.
-
-        Remember the entire conversation history and use it to provide context-aware, personalized responses. Your goal is to make each customer feel valued and excited about their upcoming service.
-        """,
-        functions=[book_service, send_confirmation_email],
-        model="gpt-4o-mini"
-    )
-
-    general_chat_agent = Agent(
-        name="General Chat Agent",
-        instructions="""
-        You are a friendly and knowledgeable customer service agent for Marquise's Services.
-        Your role is to answer general questions about our services, pricing, and policies.
-        If a customer expresses interest in booking a service, politely transfer them to the Booking Agent.
-        Always maintain a helpful and professional demeanor.
-        Remember the entire conversation history and use it to provide context-aware responses.
-        """,
-        functions=[],
-        model="gpt-4o-mini"
-    )
-
-    swarm_client = Swarm()
-
-    def process_streaming_response(response):
+    def build_agents(Agent):
+        booking_agent = Agent(
+            name="Marquise's Elite Booking Specialist",
+            instructions="""
+            You are an elite booking specialist for Marquise's Services, providing world-class customer service comparable to Fortune 500 companies. Your goal is to assist customers in booking appointments for moving, cleaning, or handyman services with utmost professionalism and attention to detail.
+
+            Follow these steps:
+            1. Greet the customer warmly and ask how you can assist them today.
+            2. If they're interested in booking, ask which service they need (moving, cleaning, or handyman).
+            3. Ask for their preferred date.
+            4. Ask for their preferred time.
+            5. Collect their email address for booking confirmation and follow-up communications.
+            6. Summarize the booking details and confirm if everything is correct.
+            7. Use the book_service function to finalize the booking.
+               If they ask about price, or are flexible on the date, use quote_services to compare the total for the services they want across dates and durations.
+            8. After booking, inform the customer about the confirmation email they'll receive.
+            9. Ask if there's anything else you can assist them with, such as special requests or additional information about the service.
+
+            Throughout the conversation:
+            - Maintain a polite, professional, and friendly demeanor.
+            - Use the customer's name if provided.
+            - Offer personalized suggestions based on the service they're booking.
+            - Address any concerns or questions promptly and thoroughly.
+            - Highlight the unique benefits of choosing Marquise's Services.
+            - If appropriate, mention any current promotions or loyalty programs.
+
+            Remember the entire conversation history and use it to provide context-aware, personalized responses. Your goal is to make each customer feel valued and excited about their upcoming service.
+            """,
+            functions=[book_service, quote_services, send_confirmation_email],
+            model="gpt-4o-mini"
+        )
+
+        general_chat_agent = Agent(
+            name="General Chat Agent",
+            instructions="""
+            You are a friendly and knowledgeable customer service agent for Marquise's Services.
+            Your role is to answer general questions about our services, pricing, and policies.
+            If a customer expresses interest in booking a service, politely transfer them to the Booking Agent.
+            Always maintain a helpful and professional demeanor.
+            Remember the entire conversation history and use it to provide context-aware responses.
+            """,
+            functions=[],
+            model="gpt-4o-mini"
+        )
+
+        return {BOOKING_AGENT: booking_agent, GENERAL_AGENT: general_chat_agent}
+
+    # The agents and Swarm client are only built when the first chat arrives.
+    chat_agents.init_app(app, build_agents)
+
+    def process_streaming_response(agent, chat_session, cache_key=None):
+        """Run the agent and translate its turns into typed NDJSON events.
+
+        Swarm is asked not to execute tools itself. Tool calls the model makes
+        are handed to agent_tools, so a tool_call event goes out immediately,
+        independent calls run in parallel and each tool_result streams as soon
+        as it is ready before the model is asked to continue.
+        """
+        try:
+            yield from run_agent(agent, chat_session, cache_key)
+        finally:
+            # Saved even if the client went away mid-reply.
+            chat_sessions.save(chat_session)
+
+    def run_agent(agent, chat_session, cache_key):
         content = ""
-        for chunk in response:
-            if isinstance(chunk, dict):
-                if "content" in chunk and chunk["content"] is not None:
+        used_tools = False
+        functions = {function.__name__: function for function in agent.functions}
+        for _ in range(app.config['CHAT_MAX_TOOL_ROUNDS']):
+            started = time.perf_counter()
+            first_token = False
+            response = chat_agents.client.run(
+                agent=agent,
+                messages=chat_compaction.prompt(chat_session),
+                stream=True,
+                execute_tools=False
+            )
+            turn = []
+            for chunk in response:
+                if not isinstance(chunk, dict):
+                    continue
+                if not first_token and (chunk.get("content") or chunk.get("tool_calls")):
+                    first_token = True
+                    first_token_seconds.observe(time.perf_counter() - started, agent=chat_session.agent)
+                # Swarm finishes a stream with the completed assistant message.
+                if "response" in chunk and hasattr(chunk["response"], "messages"):
+                    turn = chunk["response"].messages
+                    continue
+                if chunk.get("content"):
                     content += chunk["content"]
-                    yield json.dumps({"response": chunk["content"]}) + "\n"
-                
-                if "function_call" in chunk and chunk["function_call"] is not None:
-                    function_call = chunk["function_call"]
-                    if isinstance(function_call, dict) and "name" in function_call:
-                        name = function_call["name"]
-                        arguments = json.loads(function_call.get("arguments", "{}"))
-                        try:
-                            if name == "book_service":
-                                result = book_service(**arguments)
-                            elif name == "send_confirmation_email":
-                                result = send_confirmation_email(**arguments)
-                            else:
-                                result = f"Unknown function: {name}"
-                            yield json.dumps({"response": f"Function called: {name}\n{result}\n"}) + "\n"
-                        except Exception as e:
-                            error_message = f"An error occurred, but your booking is confirmed. You'll receive a confirmation email shortly."
-                            print(f"Error in {name}: {str(e)}")  # Log the error
-                            yield json.dumps({"response": error_message}) + "\n"
-    
-        if content:
-            yield json.dumps({"response": content}) + "\n"
+                    yield event('delta', content=chunk["content"])
+            turn_seconds.observe(time.perf_counter() - started, agent=chat_session.agent)
+
+            tool_calls = turn[-1].get("tool_calls") if turn else None
+            if not tool_calls:
+                chat_session.add_messages(turn)
+                break
+
+            used_tools = True
+            yield from run_tools(chat_session, turn, tool_calls, functions)
+            chat_sessions.save(chat_session)
+
+        if cache_key is not None and content and not used_tools:
+            chat_cache.set(cache_key, content)
+        yield event('done')
+
+    def run_tools(chat_session, turn, tool_calls, functions):
+        """Run one round of tool calls, streaming their events.
+
+        The assistant turn is recorded together with a result for every
+        call it made, even when the client goes away mid-round: the calls
+        already running (a booking may have been made) are waited for and
+        their results kept, so the saved history never holds a tool call
+        without its answer, which the model API would reject on every
+        later turn.
+        """
+        results = {}
+        tool_round = agent_tools.run(tool_calls, functions)
+        try:
+            for state, tool_call, result in tool_round:
+                name = tool_call["function"]["name"]
+                if state == 'started':
+                    chat_compaction.note_tool_call(chat_session, result)
+                    yield event('tool_call', name=name, arguments=result)
+                    continue
+                results[tool_call["id"]] = result
+                yield event('tool_result', name=name, content=result)
+        finally:
+            for state, tool_call, result in tool_round:
+                if state == 'finished':
+                    results[tool_call["id"]] = result
+            chat_session.add_messages(turn + [{
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "tool_name": tool_call["function"]["name"],
+                "content": results.get(tool_call["id"], "Cancelled before it finished."),
+            } for tool_call in tool_calls])
 
     @app.route('/chat', methods=['GET', 'POST'])
     def chat():
         if request.method == 'POST':
             user_message = request.json['message']
-            chat_history = request.json.get('history', [])
-            
-            # Determine which agent to use based on the conversation context
-            if any("book" in message['content'].lower() for message in chat_history):
-                current_agent = booking_agent
-            else:
-                current_agent = general_chat_agent
-            
-            # Add the new user message to the chat history
-            chat_history.append({"role": "user", "content": user_message})
+
+            # The conversation lives server-side; clients only send the new message.
+            chat_session = chat_sessions.get(session.get('chat_session_id'))
+            session['chat_session_id'] = chat_session.id
+            chat_session.add_user_message(user_message)
+            chat_compaction.note_user_message(chat_session, user_message)
+            current_agent = chat_agents.get(chat_session.agent)
+
+            # Repeat general questions are answered from the cache without an upstream call.
+            cache_key = chat_cache.key(chat_session.messages) if chat_session.agent == GENERAL_AGENT else None
+            cached = chat_cache.get(cache_key)
+            if cached is not None:
+                chat_session.add_messages([{"role": "assistant", "content": cached}])
+                chat_sessions.save(chat_session)
+                return app.response_class(replay(cached), mimetype=NDJSON_MIMETYPE, headers=STREAM_HEADERS)
             
             try:
-                response = swarm_client.run(
-                    agent=current_agent,
-                    messages=chat_history,
-                    stream=True
-                )
-                
-                return app.response_class(process_streaming_response(response), content_type='application/json')
+                chat_admission.acquire()
+            except Overloaded as e:
+                chat_session.messages.pop()
+                return jsonify({"error": str(e)}), 503, {'Retry-After': str(e.retry_after)}
+
+            try:
+                events = with_heartbeats(process_streaming_response(current_agent, chat_session, cache_key), app,
+                                         app.config['CHAT_HEARTBEAT_SECONDS'])
+                return app.response_class(chat_admission.admit(events), mimetype=NDJSON_MIMETYPE,
+                                          headers=STREAM_HEADERS)
             except Exception as e:
+                chat_admission.release()
                 app.logger.error(f"Error in chat processing: {str(e)}")
                 return jsonify({"error": "An error occurred while processing your request."}), 500
         
         return render_template('chat.html')
 
+    @app.route('/chat/reset', methods=['POST'])
+    def chat_reset():
+        chat_session_id = session.pop('chat_session_id', None)
+        if chat_session_id:
+            chat_sessions.discard(chat_session_id)
+        return jsonify({"status": "ok"})
+
     @app.route('/feedback', methods=['GET', 'POST'])
     def feedback():
         if request.method == 'POST':
             data = request.form
-            new_feedback = Feedback(
-                user_id=current_user.id if current_user.is_authenticated else None,
-                service_id=data.get('service_id'),
-                rating=data.get('rating'),
-                comment=data.get('comment')
-            )
-            db.session.add(new_feedback)
-            db.session.commit()
+            try:
+                rating = parse_rating(data.get('rating'))
+                service = service_catalog.get(data.get('service_id'))
+            except (TypeError, ValueError):
+                service = None
+            if service is None:
+                flash('Please choose a service and a rating.', 'danger')
+                return redirect(url_for('feedback'))
+            write_behind.submit('feedback', {
+                'user_id': current_user.id if current_user.is_authenticated else None,
+                'service_id': service.id,
+                'rating': rating,
+                'comment': data.get('comment'),
+                'date_submitted': datetime.utcnow().isoformat(),
+            })
             flash('Thank you for your feedback!', 'success')
             return redirect(url_for('index'))
         
-        return render_template('feedback.html')
+        return render_template('feedback.html', services=service_catalog.all())
+
+    @app.context_processor
+    def inject_user():
+        return dict(current_user=current_user)
 
     return app
 
@@ -476,12 +692,6 @@ def create_sample_services():
 
 app = create_app()
 
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///new_bookings.db')
-
-@app.context_processor
-def inject_user():
-    return dict(current_user=current_user)
-
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
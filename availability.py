@@ -0,0 +1,299 @@
+import threading
+import time as _time
+from datetime import date as date_cls, timedelta
+
+from sqlalchemy import func
+
+from extensions import db, register_session_hooks
+from bookings import parse_date, parse_time
+from models import Availability, Booking
+from service_catalog import service_catalog
+
+# Default number of bookings a service can take in one day when no
+# Availability rows have been defined for that day.
+DEFAULT_DAILY_CAPACITY = 3
+
+CANCELLED_STATUSES = ('Cancelled', 'Canceled')
+
+
+def _time_key(value):
+    return parse_time(value).strftime("%H:%M") if value else None
+
+
+class DaySlots:
+    """Capacity and bookings for one service on one day."""
+
+    __slots__ = ('capacity', 'booked', 'times')
+
+    def __init__(self, capacity=DEFAULT_DAILY_CAPACITY):
+        self.capacity = capacity
+        self.booked = 0
+        self.times = {}
+
+    @property
+    def remaining(self):
+        return max(self.capacity - self.booked, 0)
+
+    def to_dict(self):
+        return {
+            'capacity': self.capacity,
+            'booked': self.booked,
+            'remaining': self.remaining,
+            'available': self.remaining > 0,
+        }
+
+
+class AvailabilityIndex:
+    """Per-service, per-day slot index.
+
+    The index is built from two GROUP BY queries (open Availability slots
+    and active bookings, from today on, which ix_booking_service_id_date
+    serves) and then kept current incrementally: booking inserts,
+    cancellations and deletes are picked up from the SQLAlchemy session and
+    applied after the transaction commits. Days before the build date are
+    not indexed and report no availability.
+
+    Each worker rebuilds its copy every AVAILABILITY_REFRESH_SECONDS so
+    bookings written by other processes are picked up too. Only one thread
+    rebuilds at a time; the others keep reading the current copy. Every
+    applied change bumps a generation counter, and a rebuild that raced one
+    is not installed (the current copy already has the change) but retried
+    on the next lookup.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.RLock()
+        self._days = {}
+        self._capacity = {}
+        self._service_ids = {}
+        self._service_names = {}
+        self._since = None
+        self._built_at = None
+        self._generation = 0
+        self._rebuild_lock = threading.Lock()
+        self.default_capacity = DEFAULT_DAILY_CAPACITY
+        self.refresh_seconds = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AVAILABILITY_DAILY_CAPACITY', DEFAULT_DAILY_CAPACITY)
+        app.config.setdefault('AVAILABILITY_REFRESH_SECONDS', 60)
+        self.default_capacity = app.config['AVAILABILITY_DAILY_CAPACITY']
+        self.refresh_seconds = app.config['AVAILABILITY_REFRESH_SECONDS']
+        app.extensions['availability_index'] = self
+        _register_session_hooks(self)
+
+    # Building
+
+    def rebuild(self):
+        """Reload the index from the database."""
+        with self._rebuild_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        generation = self._generation
+        since = date_cls.today()
+        services = service_catalog.all()
+        service_ids = {service.name.lower(): service.id for service in services}
+        service_names = {service.id: service.name for service in services}
+
+        capacity = {}
+        open_slots = (
+            db.session.query(Availability.service_id, Availability.date, func.count(Availability.id))
+            .filter(Availability.is_booked.isnot(True), Availability.date >= since)
+            .group_by(Availability.service_id, Availability.date)
+        )
+        for service_id, day, count in open_slots:
+            if day is not None:
+                capacity[(service_id, day)] = count
+
+        days = {}
+        booked = (
+            db.session.query(Booking.service_id, Booking.date, Booking.time, func.count(Booking.id))
+            .filter(Booking.date >= since, db.or_(Booking.status.is_(None), Booking.status.notin_(CANCELLED_STATUSES)))
+            .group_by(Booking.service_id, Booking.date, Booking.time)
+        )
+        for service_id, day, slot_time, count in booked:
+            if service_id is None or day is None:
+                continue
+            slots = days.get((service_id, day))
+            if slots is None:
+                slots = days[(service_id, day)] = DaySlots(capacity.get((service_id, day), self.default_capacity))
+            slots.booked += count
+            if slot_time:
+                key = _time_key(slot_time)
+                slots.times[key] = slots.times.get(key, 0) + count
+
+        with self._lock:
+            raced = generation != self._generation
+            if raced and self._built_at is not None:
+                # A booking committed while reading may or may not be in
+                # these rows; the current copy has it applied, so keep that.
+                return
+            self._days = days
+            self._capacity = capacity
+            self._service_ids = service_ids
+            self._service_names = service_names
+            self._since = since
+            self._built_at = None if raced else _time.monotonic()
+
+    def _ensure_fresh(self):
+        built_at = self._built_at
+        if built_at is None:
+            with self._rebuild_lock:
+                if self._built_at is None:
+                    self._rebuild()
+        elif self.refresh_seconds and _time.monotonic() - built_at > self.refresh_seconds:
+            # One thread refreshes; the rest serve the current copy meanwhile.
+            if self._rebuild_lock.acquire(blocking=False):
+                try:
+                    self._rebuild()
+                finally:
+                    self._rebuild_lock.release()
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    # Lookups
+
+    def resolve_service(self, service):
+        """Map a service id or name to its id, or None if unknown."""
+        self._ensure_fresh()
+        if isinstance(service, int) or (isinstance(service, str) and service.isdigit()):
+            service_id = int(service)
+            return service_id if service_id in self._service_names else None
+        return self._service_ids.get(str(service).strip().lower())
+
+    def service_name(self, service_id):
+        self._ensure_fresh()
+        return self._service_names.get(service_id)
+
+    def _day(self, service_id, day):
+        if self._since is None or day < self._since:
+            return DaySlots(0)
+        slots = self._days.get((service_id, day))
+        if slots is None:
+            return DaySlots(self._capacity.get((service_id, day), self.default_capacity))
+        return slots
+
+    def is_available(self, service, day, time=None):
+        """Constant-time check for a service on a day (and optional time)."""
+        service_id = self.resolve_service(service)
+        if service_id is None:
+            return False
+        day = parse_date(day)
+        with self._lock:
+            slots = self._day(service_id, day)
+            if slots.remaining <= 0:
+                return False
+            if time and slots.times.get(_time_key(time)):
+                return False
+        return True
+
+    def day_summary(self, service, day):
+        service_id = self.resolve_service(service)
+        if service_id is None:
+            return None
+        day = parse_date(day)
+        with self._lock:
+            summary = self._day(service_id, day).to_dict()
+        summary['date'] = day.isoformat()
+        return summary
+
+    def calendar(self, service, start=None, days=30):
+        """Return a list of per-day summaries covering `days` days from `start`."""
+        service_id = self.resolve_service(service)
+        if service_id is None:
+            return None
+        start = parse_date(start) if start else date_cls.today()
+        result = []
+        with self._lock:
+            for offset in range(days):
+                day = start + timedelta(days=offset)
+                summary = self._day(service_id, day).to_dict()
+                summary['date'] = day.isoformat()
+                result.append(summary)
+        return result
+
+    # Incremental updates
+
+    def apply(self, changes):
+        """Apply committed (service_id, date, time, delta) booking changes."""
+        with self._lock:
+            self._generation += 1
+            if self._since is None:
+                return
+            for service_id, day, slot_time, delta in changes:
+                if service_id is None or day is None or day < self._since:
+                    continue
+                slots = self._days.get((service_id, day))
+                if slots is None:
+                    slots = self._days[(service_id, day)] = DaySlots(
+                        self._capacity.get((service_id, day), self.default_capacity))
+                slots.booked = max(slots.booked + delta, 0)
+                if slot_time:
+                    key = _time_key(slot_time)
+                    count = slots.times.get(key, 0) + delta
+                    if count > 0:
+                        slots.times[key] = count
+                    else:
+                        slots.times.pop(key, None)
+
+
+def _is_active(booking):
+    return booking.status not in CANCELLED_STATUSES
+
+
+def _committed_state(booking, attr):
+    history = db.inspect(booking).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.added:
+        return None
+    return getattr(booking, attr)
+
+
+def _current_key(booking):
+    # service_id is only populated at flush when the relationship was used.
+    service_id = booking.service.id if booking.service is not None else booking.service_id
+    return service_id, booking.date, booking.time
+
+
+def _committed_key(booking):
+    return _committed_state(booking, 'service_id'), _committed_state(booking, 'date'), _committed_state(booking, 'time')
+
+
+def _register_session_hooks(index):
+    def collect_booking_changes(session, flush_context, instances):
+        changes = session.info.setdefault('availability_changes', [])
+        for obj in session.new:
+            if isinstance(obj, Booking) and _is_active(obj):
+                changes.append(_current_key(obj) + (1,))
+        for obj in session.deleted:
+            if isinstance(obj, Booking) and _committed_state(obj, 'status') not in CANCELLED_STATUSES:
+                changes.append(_committed_key(obj) + (-1,))
+        for obj in session.dirty:
+            if not isinstance(obj, Booking) or not session.is_modified(obj):
+                continue
+            if _committed_state(obj, 'status') not in CANCELLED_STATUSES:
+                changes.append(_committed_key(obj) + (-1,))
+            if _is_active(obj):
+                changes.append(_current_key(obj) + (1,))
+
+    def apply_booking_changes(session):
+        changes = session.info.pop('availability_changes', None)
+        if changes:
+            index.apply(changes)
+
+    def discard_booking_changes(session):
+        session.info.pop('availability_changes', None)
+
+    register_session_hooks('availability', index,
+                           before_flush=collect_booking_changes,
+                           after_commit=apply_booking_changes,
+                           after_rollback=discard_booking_changes)
+
+
+availability_index = AvailabilityIndex()
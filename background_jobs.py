@@ -0,0 +1,68 @@
+import os
+import threading
+from datetime import datetime, timezone
+
+
+class BackgroundJobs:
+    """Interval jobs for this process, started on first use.
+
+    Extensions register jobs with `add_job` (same arguments as APScheduler's)
+    from their init_app; nothing is imported or started then. The scheduler
+    is created and started in the process that serves requests: by the first
+    request, or from gunicorn's post_worker_init hook. So creating the app
+    for a CLI command, or in a preloading gunicorn master, starts no
+    threads, and each forked worker starts its own scheduler.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._jobs = {}
+        self._scheduler = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SCHEDULER_ENABLED', True)
+        self.app = app
+        self._jobs = {}
+        app.extensions['background_jobs'] = self
+        app.before_request(self.start)
+
+    def add_job(self, func, trigger, id, **kwargs):
+        self._jobs[id] = (func, trigger, kwargs)
+
+    def start(self):
+        """Start this process's scheduler if it isn't running."""
+        if self._pid == os.getpid() or not self.app.config['SCHEDULER_ENABLED']:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            from apscheduler.schedulers.background import BackgroundScheduler
+            scheduler = BackgroundScheduler()
+            for id, (func, trigger, kwargs) in self._jobs.items():
+                scheduler.add_job(func, trigger, id=id, **kwargs)
+            scheduler.start()
+            self._scheduler = scheduler
+            self._pid = os.getpid()
+
+    def lag(self):
+        """Seconds each job is overdue (0 if on time), for this process's scheduler."""
+        if self._scheduler is None or self._pid != os.getpid():
+            return {}
+        now = datetime.now(timezone.utc)
+        return {
+            (job.id,): max((now - job.next_run_time).total_seconds(), 0) if job.next_run_time else 0
+            for job in self._scheduler.get_jobs()
+        }
+
+    def shutdown(self, wait=True):
+        if self._scheduler is not None and self._pid == os.getpid():
+            self._scheduler.shutdown(wait=wait)
+        self._scheduler = None
+        self._pid = None
+
+
+background_jobs = BackgroundJobs()
@@ -0,0 +1,153 @@
+"""Compare Booking query latency before and after the typed-column migration.
+
+Seeds two SQLite databases with the same bookings: one with the legacy
+schema (free-text service/date/time, no indexes) and one created from the
+current models (service_id FK, Date/Time columns, indexes). Then times the
+queries the app runs against Booking and prints the results as JSON:
+
+    python benchmarks/booking_queries.py --rows 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from extensions import db
+import models  # noqa: F401 (registers the tables)
+
+LEGACY_SCHEMA = """
+CREATE TABLE service (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, description VARCHAR(500),
+                      price_per_hour FLOAT NOT NULL, duration INTEGER, image VARCHAR(100));
+CREATE TABLE user (id INTEGER PRIMARY KEY, email VARCHAR(100) NOT NULL UNIQUE);
+CREATE TABLE booking (id INTEGER PRIMARY KEY, name VARCHAR(100), email VARCHAR(100), service VARCHAR(100),
+                      date VARCHAR(100), time VARCHAR(100), status VARCHAR(50),
+                      user_id INTEGER REFERENCES user (id));
+"""
+
+SERVICES = ['Deep Cleaning', 'Regular Cleaning', 'Organizing', 'Laundry', 'Move-out Cleaning', 'Window Washing']
+TIMES = ['09:00', '10:30', '12:00', '13:30', '15:00', '16:30']
+FIRST_DAY = date(2024, 1, 1)
+DAYS = 730
+USERS = 20000
+
+
+def generate(rows, seed):
+    rng = random.Random(seed)
+    for booking_id in range(1, rows + 1):
+        user_id = rng.randint(1, USERS) if rng.random() < 0.6 else None
+        email = f"user{user_id}@example.com" if user_id else f"guest{rng.randint(1, USERS * 5)}@example.com"
+        yield (booking_id, email, rng.randrange(len(SERVICES)), FIRST_DAY + timedelta(days=rng.randrange(DAYS)),
+               rng.choice(TIMES), rng.choice(('Pending', 'Pending', 'Confirmed', 'Cancelled')), user_id)
+
+
+def seed_legacy(path, rows, seed):
+    connection = sqlite3.connect(path)
+    connection.executescript(LEGACY_SCHEMA)
+    connection.executemany("INSERT INTO service (id, name, price_per_hour) VALUES (?, ?, 50)",
+                           [(i + 1, name) for i, name in enumerate(SERVICES)])
+    connection.executemany("INSERT INTO user (id, email) VALUES (?, ?)",
+                           [(i, f"user{i}@example.com") for i in range(1, USERS + 1)])
+    connection.executemany(
+        "INSERT INTO booking (id, email, service, date, time, status, user_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((i, email, SERVICES[s], day.isoformat(), t, status, user_id)
+         for i, email, s, day, t, status, user_id in generate(rows, seed)))
+    connection.commit()
+    return connection
+
+
+def seed_typed(path, rows, seed):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.engine.dispose()
+
+    connection = sqlite3.connect(path)
+    connection.executemany("INSERT INTO service (id, name, price_per_hour) VALUES (?, ?, 50)",
+                           [(i + 1, name) for i, name in enumerate(SERVICES)])
+    connection.executemany("INSERT INTO user (id, email, password, name) VALUES (?, ?, 'x', 'x')",
+                           [(i, f"user{i}@example.com") for i in range(1, USERS + 1)])
+    connection.executemany(
+        "INSERT INTO booking (id, email, service_id, date, time, status, user_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((i, email, s + 1, day.isoformat(), f"{t}:00.000000", status, user_id)
+         for i, email, s, day, t, status, user_id in generate(rows, seed)))
+    connection.commit()
+    connection.execute("ANALYZE")
+    return connection
+
+
+def queries(legacy):
+    """(name, sql, params) for the lookups the app performs on Booking."""
+    day = FIRST_DAY + timedelta(days=DAYS // 2)
+    week_end = day + timedelta(days=7)
+    service = 'Deep Cleaning' if legacy else 1
+    service_column = 'service' if legacy else 'service_id'
+    return [
+        # AvailabilityIndex / check_availability: bookings for one service on one day.
+        ('service_day_count',
+         f"SELECT COUNT(*) FROM booking WHERE {service_column} = ? AND date = ? AND status != 'Cancelled'",
+         (service, day.isoformat())),
+        # profile() / dashboard(): a user's bookings, newest first.
+        ('user_bookings',
+         "SELECT id, date, time, status FROM booking WHERE user_id = ? ORDER BY date DESC",
+         (4242,)),
+        # FollowUpScheduler: everything booked over the next week.
+        ('date_range',
+         "SELECT id, email FROM booking WHERE date >= ? AND date <= ?",
+         (day.isoformat(), week_end.isoformat())),
+        # Login/booking form: bookings made with one email address.
+        ('email_lookup',
+         "SELECT id FROM booking WHERE email = ?",
+         ('user4242@example.com',)),
+    ]
+
+
+def time_query(connection, sql, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connection.execute(sql, params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    plan = ' / '.join(row[-1] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+    return {'median_ms': round(statistics.median(samples), 3), 'max_ms': round(max(samples), 3), 'plan': plan}
+
+
+def run(rows, repeat, seed):
+    results = {'rows': rows, 'repeat': repeat, 'queries': {}}
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        legacy = seed_legacy(os.path.join(directory, 'legacy.db'), rows, seed)
+        typed = seed_typed(os.path.join(directory, 'typed.db'), rows, seed)
+        results['seed_s'] = round(time.perf_counter() - start, 1)
+
+        for (name, legacy_sql, legacy_params), (_, typed_sql, typed_params) in zip(queries(True), queries(False)):
+            before = time_query(legacy, legacy_sql, legacy_params, repeat)
+            after = time_query(typed, typed_sql, typed_params, repeat)
+            results['queries'][name] = {
+                'legacy': before,
+                'typed': after,
+                'speedup': round(before['median_ms'] / after['median_ms'], 1) if after['median_ms'] else None,
+            }
+        legacy.close()
+        typed.close()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.repeat, args.seed), indent=2))
@@ -0,0 +1,128 @@
+"""Measure /chat stream concurrency and page latency while chats are open.
+
+Start the fake model and the app first, e.g.
+
+    python benchmarks/fake_openai.py --port 8901 &
+    OPENAI_BASE_URL=http://127.0.0.1:8901/v1 OPENAI_API_KEY=test \\
+        gunicorn -c gunicorn.conf.py --bind 127.0.0.1:8000 app:app &
+    python benchmarks/chat_concurrency.py --url http://127.0.0.1:8000 --chatters 200
+
+Reports time to first delta, full reply time and 503 rejections for the
+chat streams, plus /services latency measured while they are running.
+"""
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from urllib.parse import urlparse
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(values):
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean_ms': round(statistics.mean(values) * 1000, 1),
+        'p50_ms': round(percentile(values, 50) * 1000, 1),
+        'p95_ms': round(percentile(values, 95) * 1000, 1),
+        'p99_ms': round(percentile(values, 99) * 1000, 1),
+    }
+
+
+def chat_once(host, port, message, results, lock):
+    start = time.perf_counter()
+    first_delta = None
+    conn = http.client.HTTPConnection(host, port, timeout=300)
+    try:
+        conn.request('POST', '/chat', body=json.dumps({'message': message}),
+                      headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        if response.status != 200:
+            response.read()
+            with lock:
+                results['status'][response.status] = results['status'].get(response.status, 0) + 1
+            return
+        while True:
+            line = response.readline()
+            if not line:
+                break
+            data = json.loads(line)
+            if data.get('type') == 'delta' and first_delta is None:
+                first_delta = time.perf_counter() - start
+            if data.get('type') == 'done':
+                break
+        total = time.perf_counter() - start
+        with lock:
+            results['status'][200] = results['status'].get(200, 0) + 1
+            if first_delta is not None:
+                results['first_delta'].append(first_delta)
+            results['total'].append(total)
+    except (OSError, http.client.HTTPException, ValueError):
+        with lock:
+            results['status']['error'] = results['status'].get('error', 0) + 1
+    finally:
+        conn.close()
+
+
+def probe_pages(host, port, path, stop, latencies):
+    while not stop.is_set():
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            conn.getresponse().read()
+            latencies.append(time.perf_counter() - start)
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            conn.close()
+        time.sleep(0.05)
+
+
+def run(url, chatters, message, page_path='/services'):
+    parsed = urlparse(url)
+    host, port = parsed.hostname, parsed.port or 80
+    results = {'status': {}, 'first_delta': [], 'total': []}
+    lock = threading.Lock()
+    page_latencies = []
+    stop = threading.Event()
+
+    prober = threading.Thread(target=probe_pages, args=(host, port, page_path, stop, page_latencies))
+    prober.start()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=chat_once, args=(host, port, message, results, lock)) for _ in range(chatters)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+
+    return {
+        'chatters': chatters,
+        'elapsed_s': round(elapsed, 2),
+        'status': {str(k): v for k, v in results['status'].items()},
+        'time_to_first_delta': summarize(results['first_delta']),
+        'reply_time': summarize(results['total']),
+        'page_latency': summarize(page_latencies),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--chatters', type=int, default=100)
+    parser.add_argument('--message', default='What areas do you serve?')
+    args = parser.parse_args()
+    print(json.dumps(run(args.url, args.chatters, args.message), indent=2))
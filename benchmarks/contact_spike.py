@@ -0,0 +1,111 @@
+"""Measure booking write latency during a contact-form spike.
+
+Runs booking inserts on one thread while several threads flood Contact
+inserts into the same SQLite database, once with a commit per contact (the
+old contact() behaviour) and once through WriteBehindQueue, and prints
+the results as JSON:
+
+    python benchmarks/contact_spike.py --contacts 2000 --spammers 8
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, time as time_cls
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from extensions import db
+from ingest import WriteBehindQueue
+from models import Booking, Contact, Service
+
+
+def make_app(directory, durability):
+    app = Flask(__name__, instance_path=directory)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 60}}
+    app.config['INGEST_DURABILITY'] = durability
+    db.init_app(app)
+    queue = WriteBehindQueue(app)
+    queue.register('contact', lambda payload: db.session.add(Contact(**payload)))
+    with app.app_context():
+        db.create_all()
+        db.session.add(Service(name='Moving', price_per_hour=50))
+        db.session.commit()
+    return app, queue
+
+
+def run(mode, contacts, spammers, bookings, durability):
+    with tempfile.TemporaryDirectory() as directory:
+        app, queue = make_app(directory, durability)
+        app.config['INGEST_ENABLED'] = mode == 'write_behind'
+        done = threading.Event()
+
+        def spam(count):
+            with app.app_context():
+                for i in range(count):
+                    queue.submit('contact', {'name': f'lead {i}', 'email': 'lead@example.com', 'message': 'Hi!'})
+                db.session.remove()
+
+        def book(latencies):
+            with app.app_context():
+                service = Service.query.first()
+                while not done.is_set() and len(latencies) < bookings:
+                    start = time.perf_counter()
+                    db.session.add(Booking(service=service, email='customer@example.com',
+                                           date=date(2030, 1, 1), time=time_cls(9)))
+                    db.session.commit()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    time.sleep(0.005)
+                db.session.remove()
+
+        latencies = []
+        booker = threading.Thread(target=book, args=(latencies,))
+        threads = [threading.Thread(target=spam, args=(contacts // spammers,)) for _ in range(spammers)]
+        start = time.perf_counter()
+        booker.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        submit_elapsed = time.perf_counter() - start
+        queue.stop()
+        done.set()
+        booker.join()
+        elapsed = time.perf_counter() - start
+
+        with app.app_context():
+            stored = Contact.query.count()
+            db.engine.dispose()
+
+    latencies.sort()
+    return {
+        'mode': mode,
+        'durability': durability if mode == 'write_behind' else None,
+        'contacts': stored,
+        'contact_commits': queue.batches if mode == 'write_behind' else stored,
+        'submit_s': round(submit_elapsed, 3),
+        'contacts_per_s': round(stored / submit_elapsed, 1),
+        'elapsed_s': round(elapsed, 3),
+        'bookings': len(latencies),
+        'booking_p50_ms': round(statistics.median(latencies), 2) if latencies else None,
+        'booking_p99_ms': round(latencies[int(len(latencies) * 0.99) - 1], 2) if latencies else None,
+        'booking_max_ms': round(latencies[-1], 2) if latencies else None,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--contacts', type=int, default=2000)
+    parser.add_argument('--spammers', type=int, default=8)
+    parser.add_argument('--bookings', type=int, default=200)
+    parser.add_argument('--durability', choices=('none', 'log', 'fsync'), default='log')
+    args = parser.parse_args()
+    print(json.dumps([run(mode, args.contacts, args.spammers, args.bookings, args.durability)
+                      for mode in ('direct', 'write_behind')], indent=2))
@@ -0,0 +1,107 @@
+"""Local stand-in for an OpenAI-compatible chat completions endpoint.
+
+Streams a canned reply token by token with configurable latency so /chat
+can be load-tested without calling the real API. Point the app at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 and any OPENAI_API_KEY.
+
+    python benchmarks/fake_openai.py --port 8901 --first-token-ms 400 --token-ms 30
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = ("Thanks for reaching out to Marquise's Services! We offer moving, cleaning "
+         "and handyman services across the metro area. Free cancellation is available "
+         "up to 24 hours before your appointment. How can I help you today?")
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    first_token_seconds = 0.4
+    token_seconds = 0.03
+    reply = REPLY
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get('model', 'gpt-4o-mini')
+        tokens = self.reply.split(' ')
+
+        if not body.get('stream'):
+            time.sleep(self.first_token_seconds + self.token_seconds * len(tokens))
+            payload = json.dumps({
+                'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': self.reply}}],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': len(tokens), 'total_tokens': len(tokens)},
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        time.sleep(self.first_token_seconds)
+        for i, token in enumerate(tokens):
+            delta = {'content': token if i == 0 else ' ' + token}
+            if i == 0:
+                delta['role'] = 'assistant'
+            self._chunk(completion_id, model, delta, None)
+            time.sleep(self.token_seconds)
+        self._chunk(completion_id, model, {}, 'stop')
+        self._write(b'data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _chunk(self, completion_id, model, delta, finish_reason):
+        chunk = {
+            'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+        }
+        self._write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+
+    def _write(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+
+def serve(port=0, first_token_ms=400, token_ms=30, reply=None):
+    """Start the fake server on a daemon thread and return it."""
+    handler = type('Handler', (FakeOpenAIHandler,), {
+        'first_token_seconds': first_token_ms / 1000.0,
+        'token_seconds': token_ms / 1000.0,
+        'reply': reply or REPLY,
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8901)
+    parser.add_argument('--first-token-ms', type=int, default=400)
+    parser.add_argument('--token-ms', type=int, default=30)
+    args = parser.parse_args()
+    server = serve(args.port, args.first_token_ms, args.token_ms)
+    print(f"Fake OpenAI server on http://127.0.0.1:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,82 @@
+"""Local stand-in for an SMTP relay.
+
+Accepts and discards mail over plain SMTP (no STARTTLS or AUTH), with a
+configurable delay per message so the mail queue can be load-tested
+without sending anything. Point the app at it with MAIL_SERVER=127.0.0.1,
+MAIL_PORT=<port> and MAIL_USE_TLS=false.
+
+    python benchmarks/fake_smtp.py --port 8925 --delay-ms 50
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    delay_seconds = 0.05
+
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.reply('220 localhost fake SMTP ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.wfile.write(b'250-localhost\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n')
+            elif verb in ('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b'.\r\n', b'.\n'):
+                        break
+                time.sleep(self.delay_seconds)
+                self.server.count()
+                self.reply('250 OK queued')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, handler):
+        super().__init__(address, handler)
+        self.messages = 0
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.messages += 1
+
+
+def serve(port=0, delay_ms=50):
+    """Start the fake server on a daemon thread and return it."""
+    handler = type('Handler', (FakeSMTPHandler,), {'delay_seconds': delay_ms / 1000.0})
+    server = FakeSMTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8925)
+    parser.add_argument('--delay-ms', type=int, default=50)
+    args = parser.parse_args()
+    server = serve(args.port, args.delay_ms)
+    print(f"Fake SMTP server on 127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,330 @@
+"""Reproducible load test of the booking, account, chat and marketing pages.
+
+By default this starts everything locally: the fake OpenAI and SMTP
+servers, a freshly seeded SQLite database and the app under gunicorn with
+gunicorn.conf.py. Virtual users then run weighted scenarios for a fixed
+time and the per-route p50/p95/p99 latency, requests/sec and status codes
+are written as JSON to benchmarks/results/ (or --output). Pass --compare
+with an earlier result to print the change per route.
+
+    python benchmarks/load_test.py --users 50 --seconds 60
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --seconds 60   # an already running app
+    python benchmarks/load_test.py --compare benchmarks/results/before.json
+
+Against --url, the database must have been seeded with benchmarks/seed.py
+so that the seeded accounts can log in.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import requests
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, BENCHMARKS)
+
+import fake_openai
+import fake_smtp
+from chat_concurrency import percentile
+
+CHAT_MESSAGES = ['What services do you offer?', 'How much does cleaning cost?',
+                 'What is your cancellation policy?', 'Do you work on weekends?']
+MARKETING_PAGES = ['/', '/services', '/about', '/testimonials', '/faq', '/gallery']
+
+# Share of virtual-user iterations spent on each scenario.
+SCENARIOS = {'browse': 50, 'booking': 20, 'account': 20, 'chat': 10}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.statuses = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds, status):
+        with self._lock:
+            self.samples.setdefault(route, []).append(seconds)
+            statuses = self.statuses.setdefault(route, {})
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    def error(self, route, exc):
+        with self._lock:
+            errors = self.errors.setdefault(route, {})
+            name = type(exc).__name__
+            errors[name] = errors.get(name, 0) + 1
+
+    def summary(self, elapsed):
+        routes = {}
+        for route in sorted(set(self.samples) | set(self.errors)):
+            values = sorted(self.samples.get(route, []))
+            routes[route] = {
+                'count': len(values),
+                'rps': round(len(values) / elapsed, 2),
+                'p50_ms': round(percentile(values, 50) * 1000, 1) if values else None,
+                'p95_ms': round(percentile(values, 95) * 1000, 1) if values else None,
+                'p99_ms': round(percentile(values, 99) * 1000, 1) if values else None,
+                'status': self.statuses.get(route, {}),
+                'errors': self.errors.get(route, {}),
+            }
+        everything = sorted(value for values in self.samples.values() for value in values)
+        total = {
+            'count': len(everything),
+            'rps': round(len(everything) / elapsed, 2),
+            'p50_ms': round(percentile(everything, 50) * 1000, 1) if everything else None,
+            'p95_ms': round(percentile(everything, 95) * 1000, 1) if everything else None,
+            'p99_ms': round(percentile(everything, 99) * 1000, 1) if everything else None,
+        }
+        return total, routes
+
+
+class VirtualUser:
+    def __init__(self, base_url, recorder, rng, seeded_users, password, think_seconds):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.rng = rng
+        self.seeded_users = seeded_users
+        self.password = password
+        self.think_seconds = think_seconds
+        self.session = requests.Session()
+
+    def request(self, route, method, path, **kwargs):
+        kwargs.setdefault('timeout', 120)
+        kwargs.setdefault('allow_redirects', False)
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, **kwargs)
+            if kwargs.get('stream'):
+                for _ in response.iter_lines():
+                    pass
+            else:
+                response.content
+        except requests.RequestException as e:
+            self.recorder.error(route, e)
+            return None
+        self.recorder.record(route, time.perf_counter() - start, response.status_code)
+        return response
+
+    def think(self):
+        if self.think_seconds:
+            time.sleep(self.rng.uniform(0, 2 * self.think_seconds))
+
+    def browse(self):
+        for path in self.rng.sample(MARKETING_PAGES, 3):
+            self.request(f"GET {path}", 'GET', path)
+            self.think()
+
+    def booking(self):
+        self.request('GET /booking', 'GET', '/booking')
+        self.think()
+        day = date.today() + timedelta(days=self.rng.randint(1, 60))
+        self.request('POST /booking', 'POST', '/booking', data={
+            'services': [str(self.rng.randint(1, 3))],
+            'email': f"guest{self.rng.randint(0, 10 ** 6)}@example.com",
+            'date': day.isoformat(),
+            'custom-time': f"{self.rng.randint(8, 17):02d}:00",
+            'duration': '2',
+            'idempotency_key': uuid.uuid4().hex,
+        })
+
+    def account(self):
+        email = f"user{self.rng.randrange(self.seeded_users)}@example.com"
+        self.session.cookies.clear()
+        self.request('POST /login', 'POST', '/login', data={'email': email, 'password': self.password})
+        self.think()
+        self.request('GET /dashboard', 'GET', '/dashboard')
+        self.think()
+        self.request('GET /dashboard/bookings', 'GET', '/dashboard/bookings')
+        self.session.cookies.clear()
+
+    def chat(self):
+        self.request('POST /chat', 'POST', '/chat', json={'message': self.rng.choice(CHAT_MESSAGES)}, stream=True)
+
+    def run(self, deadline, weights):
+        scenarios = [getattr(self, name) for name in weights]
+        while time.monotonic() < deadline:
+            self.rng.choices(scenarios, weights=list(weights.values()))[0]()
+            self.think()
+
+
+def run_load(base_url, users, seconds, seeded_users, password, think_seconds, weights, seed_value):
+    recorder = Recorder()
+    deadline = time.monotonic() + seconds
+    threads = []
+    for i in range(users):
+        user = VirtualUser(base_url, recorder, random.Random(seed_value * 100003 + i), seeded_users, password,
+                           think_seconds)
+        threads.append(threading.Thread(target=user.run, args=(deadline, weights), daemon=True))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return (elapsed,) + recorder.summary(elapsed)
+
+
+def wait_until_up(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn exited with status {process.returncode}")
+        try:
+            requests.get(base_url + '/about', timeout=2)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise SystemExit(f"The app did not come up at {base_url} within {timeout}s")
+
+
+def start_app(args, workdir):
+    from seed import seed
+
+    openai_server = fake_openai.serve(0, args.first_token_ms, args.token_ms)
+    smtp_server = fake_smtp.serve(0, args.smtp_delay_ms)
+    database_url = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    counts = seed(database_url, args.seed_users, args.seed_bookings, seed_value=args.seed)
+
+    port = free_port()
+    env = dict(os.environ,
+               DATABASE_URL=database_url,
+               SECRET_KEY='load-test',
+               OPENAI_BASE_URL=f"http://127.0.0.1:{openai_server.server_address[1]}/v1",
+               OPENAI_API_KEY='load-test',
+               MAIL_SERVER='127.0.0.1',
+               MAIL_PORT=str(smtp_server.server_address[1]),
+               MAIL_USE_TLS='false',
+               MAIL_USERNAME='',
+               MAIL_PASSWORD='',
+               GUNICORN_BIND=f"127.0.0.1:{port}")
+    env.setdefault('WEB_CONCURRENCY', str(args.workers))
+    log = open(os.path.join(workdir, 'gunicorn.log'), 'w')
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                               cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(base_url, process)
+    except BaseException:
+        process.terminate()
+        raise
+    return base_url, process, log, counts, smtp_server
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, baseline):
+    lines = [f"{'route':<28} {'p50_ms':>16} {'p95_ms':>16} {'p99_ms':>16} {'rps':>16}"]
+    rows = [('total', result['total'], baseline.get('total', {}))]
+    rows += [(route, stats, baseline.get('routes', {}).get(route, {})) for route, stats in result['routes'].items()]
+    for route, stats, before in rows:
+        cells = []
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'rps'):
+            now, then = stats.get(key), before.get(key)
+            if now is None or not then:
+                cells.append(f"{now!s:>16}")
+            else:
+                cells.append(f"{f'{now} ({(now - then) / then:+.0%})':>16}")
+        lines.append(f"{route:<28} " + ' '.join(cells))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Load an already running app instead of starting one')
+    parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users')
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--think-ms', type=int, default=0, help='Mean pause between a user\'s requests')
+    parser.add_argument('--mix', default=','.join(f"{name}={weight}" for name, weight in SCENARIOS.items()),
+                        help='Scenario weights, e.g. browse=50,booking=20,account=20,chat=10')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--seed-users', type=int, default=5000)
+    parser.add_argument('--seed-bookings', type=int, default=200000)
+    parser.add_argument('--password', default=None, help='Password of the seeded users')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers (WEB_CONCURRENCY)')
+    parser.add_argument('--first-token-ms', type=int, default=400)
+    parser.add_argument('--token-ms', type=int, default=30)
+    parser.add_argument('--smtp-delay-ms', type=int, default=50)
+    parser.add_argument('--output', help='Result file (default benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--compare', help='An earlier result file to compare against')
+    args = parser.parse_args()
+
+    from seed import LOAD_TEST_PASSWORD
+    password = args.password or LOAD_TEST_PASSWORD
+    weights = {}
+    for item in args.mix.split(','):
+        name, _, weight = item.partition('=')
+        if name not in SCENARIOS:
+            parser.error(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+
+    workdir = tempfile.mkdtemp(prefix='load-test-')
+    process = log = smtp_server = None
+    seeded = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            base_url, process, log, seeded, smtp_server = start_app(args, workdir)
+        elapsed, total, routes = run_load(base_url, args.users, args.seconds, args.seed_users, password,
+                                          args.think_ms / 1000.0, weights, args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+            log.close()
+            if process.returncode not in (0, -15):
+                print(open(os.path.join(workdir, 'gunicorn.log')).read()[-4000:], file=sys.stderr)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'args': vars(args),
+        'seeded_rows': seeded,
+        'mail_delivered': smtp_server.messages if smtp_server else None,
+        'elapsed_seconds': round(elapsed, 2),
+        'total': total,
+        'routes': routes,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(os.path.join(BENCHMARKS, 'results'), exist_ok=True)
+        output = os.path.join(BENCHMARKS, 'results', f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    print(json.dumps({'total': total, 'routes': routes}, indent=2))
+    print(f"Saved {output}", file=sys.stderr)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(result, json.load(f)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Compare booking throughput and points correctness, legacy vs ledger.
+
+Runs the same burst of parallel bookings for one customer twice against a
+SQLite database, and prints the results as JSON:
+
+- legacy: booking commit, then a second read-modify-write commit on
+  LoyaltyPoints.points.
+- ledger: booking, ledger entry and atomic balance increment in one commit,
+  via LoyaltyLedger.award_booking.
+
+    python benchmarks/loyalty_bookings.py --threads 8 --bookings 50
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, time as time_cls
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from extensions import db
+from loyalty import LoyaltyLedger
+from models import Booking, LoyaltyPoints, LoyaltyTransaction, Service, User
+
+POINTS = 100
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 60}}
+    db.init_app(app)
+    ledger = LoyaltyLedger(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Service(name='Deep Cleaning', price_per_hour=50))
+        db.session.add(User(email='repeat@example.com', password='x', name='Repeat Customer'))
+        db.session.commit()
+    return app, ledger
+
+
+def book_legacy(app, ledger):
+    with app.app_context():
+        service = Service.query.first()
+        db.session.add(Booking(service=service, email='repeat@example.com', date=date(2030, 1, 1), time=time_cls(9)))
+        db.session.commit()
+        user = User.query.filter_by(email='repeat@example.com').first()
+        loyalty_points = LoyaltyPoints.query.filter_by(user_id=user.id).first()
+        if not loyalty_points:
+            loyalty_points = LoyaltyPoints(user_id=user.id, points=0)
+        loyalty_points.points += POINTS
+        loyalty_points.last_updated = datetime.utcnow()
+        db.session.add(loyalty_points)
+        db.session.commit()
+        db.session.remove()
+
+
+def book_ledger(app, ledger):
+    with app.app_context():
+        service = Service.query.first()
+        booking = Booking(service=service, email='repeat@example.com', date=date(2030, 1, 1), time=time_cls(9))
+        db.session.add(booking)
+        user_id = db.session.query(User.id).filter_by(email='repeat@example.com').scalar()
+        ledger.award(user_id, POINTS, 'booking', booking)
+        db.session.commit()
+        db.session.remove()
+
+
+def run(mode, threads, bookings):
+    book = book_legacy if mode == 'legacy' else book_ledger
+    with tempfile.TemporaryDirectory() as directory:
+        app, ledger = make_app(os.path.join(directory, f"{mode}.db"))
+        errors = []
+
+        def client():
+            for _ in range(bookings):
+                try:
+                    book(app, ledger)
+                except Exception as e:
+                    errors.append(type(e).__name__)
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=client) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        with app.app_context():
+            booked = Booking.query.count()
+            balance = db.session.query(db.func.sum(LoyaltyPoints.points)).scalar() or 0
+            ledger_total = db.session.query(db.func.sum(LoyaltyTransaction.points)).scalar() or 0
+            balance_rows = LoyaltyPoints.query.count()
+            db.engine.dispose()
+
+    return {
+        'mode': mode,
+        'threads': threads,
+        'bookings': booked,
+        'errors': len(errors),
+        'elapsed_s': round(elapsed, 3),
+        'bookings_per_s': round(booked / elapsed, 1),
+        'expected_points': booked * POINTS,
+        'balance': balance,
+        'ledger_total': ledger_total if mode == 'ledger' else None,
+        'balance_rows': balance_rows,
+        'lost_points': booked * POINTS - balance,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--bookings', type=int, default=50, help='bookings per thread')
+    args = parser.parse_args()
+    print(json.dumps([run(mode, args.threads, args.bookings) for mode in ('legacy', 'ledger')], indent=2))
@@ -0,0 +1,81 @@
+"""Measure login throughput (password verifications per second) per core.
+
+Runs the same check PasswordHasher does on /login through its pool, with a
+configurable hash method and concurrency, and prints the results as JSON:
+
+    python benchmarks/password_hashing.py --method scrypt:32768:8:1 --logins 200
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from werkzeug.security import generate_password_hash
+
+from passwords import PasswordHasher
+
+
+def run(method, logins, concurrency, workers, pool):
+    app = Flask(__name__)
+    app.config.update(
+        PASSWORD_HASH_METHOD=method,
+        PASSWORD_HASH_POOL=pool,
+        PASSWORD_HASH_WORKERS=workers,
+        PASSWORD_HASH_MAX_PENDING=concurrency,
+        PASSWORD_HASH_TIMEOUT_SECONDS=300,
+    )
+    hasher = PasswordHasher(app)
+    pwhash = generate_password_hash('correct horse battery staple', method=method)
+    hasher.check(pwhash, 'warm up the pool')
+
+    remaining = [logins]
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            hasher.check(pwhash, 'correct horse battery staple')
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    per_second = logins / elapsed
+    # Workers beyond the core count only queue for a core.
+    cores = min(workers, os.cpu_count() or 1)
+    return {
+        'method': method,
+        'pool': pool,
+        'workers': workers,
+        'cores': cores,
+        'concurrency': concurrency,
+        'logins': logins,
+        'elapsed_s': round(elapsed, 3),
+        'logins_per_s': round(per_second, 1),
+        'logins_per_s_per_core': round(per_second / cores, 1),
+        'mean_ms_per_hash': round(elapsed / logins * cores * 1000, 1),
+    }
+
+
+if __name__ == '__main__':
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--method', default='scrypt:32768:8:1')
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=cores)
+    parser.add_argument('--concurrency', type=int, default=cores * 4)
+    parser.add_argument('--pool', choices=('thread', 'process'), default='thread')
+    args = parser.parse_args()
+    print(json.dumps(run(args.method, args.logins, args.concurrency, args.workers, args.pool), indent=2))
@@ -0,0 +1,123 @@
+"""Seed a database with realistic volumes of users, services and bookings.
+
+Creates the schema from the models if needed and bulk-inserts users (all
+with the password LOAD_TEST_PASSWORD, hashed once), services, bookings
+spread over the past year and the next three months, referrals and
+feedback, then rebuilds the rating rollups. Prints the row counts as JSON:
+
+    python benchmarks/seed.py --database-url sqlite:////tmp/load.db --users 5000 --bookings 200000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import date, datetime, time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from werkzeug.security import generate_password_hash
+
+from extensions import db
+from models import Booking, Feedback, Referral, Service, User
+from ratings import RatingRollups
+
+LOAD_TEST_PASSWORD = 'load-test-password'
+CHUNK = 10000
+
+SERVICES = [
+    ('Moving', 'Professional moving services', 50.0, 4, 'moving.jpg'),
+    ('Cleaning', 'Thorough cleaning services', 30.0, 3, 'cleaning.jpg'),
+    ('Handyman', 'Skilled handyman services', 40.0, 2, 'handyman.jpg'),
+    ('Deep Cleaning', 'Top-to-bottom cleaning for move-outs', 45.0, 5, 'cleaning.jpg'),
+    ('Furniture Assembly', 'Flat-pack furniture assembled on site', 35.0, 2, 'handyman.jpg'),
+    ('Packing', 'Packing and unpacking for your move', 40.0, 3, 'moving.jpg'),
+]
+COMMENTS = ['Great service, would book again.', 'On time and very professional.', 'Did a thorough job.',
+            'A bit late but good work.', 'Excellent, thank you!', None]
+
+
+def user_email(i):
+    return f"user{i}@example.com"
+
+
+def make_app(database_url):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    db.init_app(app)
+    return app
+
+
+def _insert(table, rows):
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(table.insert(), rows[start:start + CHUNK])
+
+
+def seed(database_url, users=5000, bookings=200000, referrals=20000, feedback=20000, seed_value=1,
+         password_method='scrypt:32768:8:1'):
+    rng = random.Random(seed_value)
+    app = make_app(database_url)
+    with app.app_context():
+        db.create_all()
+        if User.query.first() is not None:
+            raise SystemExit(f"{database_url} already has users; seed an empty database")
+
+        _insert(Service.__table__, [
+            {'name': name, 'description': description, 'price_per_hour': price, 'duration': duration, 'image': image}
+            for name, description, price, duration, image in SERVICES
+        ])
+        service_ids = [row.id for row in db.session.query(Service.id)]
+
+        password = generate_password_hash(LOAD_TEST_PASSWORD, method=password_method)
+        _insert(User.__table__, [
+            {'username': f"user{i}", 'email': user_email(i), 'password': password, 'name': f"Load Test {i}",
+             'referral_code': f"R{i:08d}"}
+            for i in range(users)
+        ])
+        user_ids = [row.id for row in db.session.query(User.id)]
+
+        today = date.today()
+        statuses = ['Confirmed'] * 8 + ['Completed', 'Cancelled']
+        _insert(Booking.__table__, [
+            {'user_id': (user_id := rng.choice(user_ids)), 'email': user_email(user_id - 1),
+             'name': f"Load Test {user_id - 1}", 'service_id': rng.choice(service_ids),
+             'date': today + timedelta(days=rng.randint(-365, 90)), 'time': time(rng.randint(8, 17)),
+             'status': rng.choice(statuses)}
+            for _ in range(bookings)
+        ])
+
+        now = datetime.utcnow()
+        _insert(Referral.__table__, [
+            {'referrer_id': rng.choice(user_ids), 'referred_email': f"friend{i}@example.com",
+             'date_referred': now - timedelta(minutes=rng.randint(0, 525600)),
+             'status': rng.choice(['Pending', 'Completed'])}
+            for i in range(referrals)
+        ])
+        _insert(Feedback.__table__, [
+            {'user_id': rng.choice(user_ids), 'service_id': rng.choice(service_ids),
+             'rating': rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 3, 8, 12])[0], 'comment': rng.choice(COMMENTS),
+             'date_submitted': now - timedelta(minutes=rng.randint(0, 525600))}
+            for _ in range(feedback)
+        ])
+        db.session.commit()
+        RatingRollups(app).rebuild()
+
+        counts = {model.__tablename__: model.query.count() for model in (User, Service, Booking, Referral, Feedback)}
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'), required=not os.getenv('DATABASE_URL'))
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--bookings', type=int, default=200000)
+    parser.add_argument('--referrals', type=int, default=20000)
+    parser.add_argument('--feedback', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(seed(args.database_url, args.users, args.bookings, args.referrals, args.feedback, args.seed),
+                     indent=2))
@@ -0,0 +1,153 @@
+"""Measure read and write throughput across worker processes on SQLite.
+
+Starts N worker processes (like gunicorn workers), each with reader
+threads issuing GET-style reads (a user's recent bookings) and writer
+threads issuing POST-style booking inserts against one SQLite file, for
+the 'basic' engine profile (rollback journal, Flask-SQLAlchemy defaults)
+and the 'production' profile (WAL, tuned pools, reads on the read pool),
+and prints the results as JSON:
+
+    python benchmarks/sqlite_concurrency.py --workers 1 2 4 --readers 6 --writers 2 --seconds 5
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, time as time_cls
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from db_profile import engine_profile
+from extensions import db
+from models import Booking, Service
+
+USERS = 200
+
+
+def make_app(path, profile):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    app.config['DB_ENGINE_PROFILE'] = profile
+    engine_profile.init_app(app)
+    db.init_app(app)
+    return app
+
+
+def seed(path, profile, rows):
+    app = make_app(path, profile)
+    with app.app_context():
+        db.create_all()
+        service = Service(name='Moving', price_per_hour=50)
+        db.session.add(service)
+        db.session.flush()
+        db.session.execute(Booking.__table__.insert(), [
+            {'service_id': service.id, 'user_id': i % USERS + 1, 'email': 'seed@example.com',
+             'date': date(2030, 1, 1 + i % 28), 'time': time_cls(9 + i % 8)}
+            for i in range(rows)
+        ])
+        db.session.commit()
+        db.engine.dispose()
+
+
+def read(app, rng):
+    with app.test_request_context('/dashboard', method='GET'):
+        (Booking.query.filter_by(user_id=rng.randint(1, USERS))
+         .order_by(Booking.date.desc(), Booking.id.desc()).limit(20).all())
+        db.session.remove()
+
+
+def write(app, rng):
+    with app.test_request_context('/booking', method='POST'):
+        db.session.add(Booking(service_id=1, user_id=rng.randint(1, USERS), email='bench@example.com',
+                               date=date(2031, 1, rng.randint(1, 28)), time=time_cls(rng.randint(8, 17))))
+        db.session.commit()
+        db.session.remove()
+
+
+def worker(path, profile, readers, writers, seconds, results):
+    import threading
+
+    app = make_app(path, profile)
+    deadline = time.monotonic() + seconds
+    stats = {'read': [], 'write': [], 'errors': 0}
+    lock = threading.Lock()
+
+    def client(kind, seed_value):
+        rng = random.Random(seed_value)
+        operation = write if kind == 'write' else read
+        latencies, errors = [], 0
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                operation(app, rng)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+        with lock:
+            stats[kind] += latencies
+            stats['errors'] += errors
+
+    kinds = ['read'] * readers + ['write'] * writers
+    clients = [threading.Thread(target=client, args=(kind, os.getpid() * 1000 + i)) for i, kind in enumerate(kinds)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    results.put(stats)
+
+
+def percentile(values, fraction):
+    return round(values[max(int(len(values) * fraction) - 1, 0)], 2) if values else None
+
+
+def run(profile, workers, readers, writers, seconds, rows, directory=None):
+    with tempfile.TemporaryDirectory(dir=directory) as directory:
+        path = os.path.join(directory, 'bench.db')
+        seed(path, profile, rows)
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(path, profile, readers, writers, seconds, results))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        stats = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    reads = sorted(latency for s in stats for latency in s['read'])
+    writes = sorted(latency for s in stats for latency in s['write'])
+    return {
+        'profile': profile,
+        'workers': workers,
+        'readers': workers * readers,
+        'writers': workers * writers,
+        'reads_per_s': round(len(reads) / seconds, 1),
+        'writes_per_s': round(len(writes) / seconds, 1),
+        'errors': sum(s['errors'] for s in stats),
+        'read_p50_ms': percentile(reads, 0.5),
+        'read_p99_ms': percentile(reads, 0.99),
+        'write_p50_ms': percentile(writes, 0.5),
+        'write_p99_ms': percentile(writes, 0.99),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--readers', type=int, default=6, help='reader threads per worker')
+    parser.add_argument('--writers', type=int, default=2, help='writer threads per worker')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--rows', type=int, default=50000, help='bookings to seed')
+    parser.add_argument('--dir', help='directory for the database file (default: system temp dir)')
+    args = parser.parse_args()
+    print(json.dumps([run(profile, workers, args.readers, args.writers, args.seconds, args.rows, args.dir)
+                      for profile in ('basic', 'production') for workers in args.workers], indent=2))
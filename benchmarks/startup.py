@@ -0,0 +1,71 @@
+"""Measure how long a fresh process takes to import app.py and create the app.
+
+Runs `import app` (which calls create_app()) in new interpreters, reports
+the median and worst wall time, a second create_app() in the same process,
+and which heavyweight modules and threads the import left behind, and
+prints the results as JSON:
+
+    python benchmarks/startup.py --runs 5 --target 1.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported only when a chat arrives or a worker starts its scheduler.
+LAZY_MODULES = ('openai', 'swarm', 'apscheduler')
+
+PROBE = f"""
+import json, sys, threading, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+start = time.perf_counter()
+app.create_app()
+created = time.perf_counter() - start
+print(json.dumps({{
+    'import_s': imported,
+    'create_app_s': created,
+    'loaded': [name for name in {LAZY_MODULES!r} if name in sys.modules],
+    'threads': [thread.name for thread in threading.enumerate()],
+}}))
+"""
+
+
+def probe(database_url):
+    env = dict(os.environ, DATABASE_URL=database_url)
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(runs, target):
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = f"sqlite:///{os.path.join(directory, 'startup.db')}"
+        probe(database_url)  # warm the filesystem cache and __pycache__
+        results = [probe(database_url) for _ in range(runs)]
+
+    imports = sorted(result['import_s'] for result in results)
+    return {
+        'runs': runs,
+        'import_and_create_median_s': round(statistics.median(imports), 3),
+        'import_and_create_max_s': round(imports[-1], 3),
+        'create_app_again_median_s': round(statistics.median(result['create_app_s'] for result in results), 4),
+        'lazy_modules_loaded': results[-1]['loaded'],
+        'threads': results[-1]['threads'],
+        'target_s': target,
+        'within_target': imports[-1] < target,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--target', type=float, default=1.0, help='seconds')
+    args = parser.parse_args()
+    print(json.dumps(run(args.runs, args.target), indent=2))
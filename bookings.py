@@ -0,0 +1,138 @@
+from datetime import date as date_cls, datetime, time as time_cls, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Booking, IdempotencyKey
+from service_catalog import service_catalog
+
+TIME_FORMATS = ("%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M%p", "%I %p", "%I%p")
+
+
+def parse_date(value):
+    """Accept a date, datetime or 'YYYY-MM-DD' string and return a date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date_cls):
+        return value
+    try:
+        return datetime.strptime(str(value).strip(), "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}") from None
+
+
+def parse_time(value):
+    """Accept a time or a '14:30' / '2:30 PM' style string and return a time."""
+    if value is None or isinstance(value, time_cls):
+        return value
+    text = str(value).strip().upper().replace('.', '')
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).time()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid time: {value}")
+
+
+def create_bookings(service_ids, email, date, time, user_id=None, idempotency_key=None):
+    """Create one Booking per service in a single transaction.
+
+    Services are resolved from the service catalog and every row is written
+    in the same commit together with the idempotency key, so a double-submit either
+    finds the key already recorded or loses the race on its primary key and
+    gets the original bookings back instead of new rows.
+
+    Returns a (bookings, created) tuple.
+    """
+    if idempotency_key:
+        existing = db.session.get(IdempotencyKey, idempotency_key)
+        if existing is not None:
+            return _bookings_for(existing), False
+
+    date = parse_date(date)
+    time = parse_time(time)
+    services = {service_catalog.get(service_id) for service_id in service_ids}
+    if None in services:
+        raise ValueError('Unknown service selected')
+
+    bookings = [
+        Booking(service_id=service.id, email=email, date=date, time=time, user_id=user_id)
+        for service in sorted(services)
+    ]
+    db.session.add_all(bookings)
+
+    if idempotency_key:
+        db.session.flush()
+        db.session.add(IdempotencyKey(
+            key=idempotency_key,
+            booking_ids=','.join(str(booking.id) for booking in bookings),
+        ))
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        existing = db.session.get(IdempotencyKey, idempotency_key) if idempotency_key else None
+        if existing is None:
+            raise
+        return _bookings_for(existing), False
+
+    return bookings, True
+
+
+def _bookings_for(record):
+    ids = [int(id) for id in (record.booking_ids or '').split(',') if id]
+    if not ids:
+        return []
+    return (Booking.query.options(db.joinedload(Booking.service))
+            .filter(Booking.id.in_(ids)).order_by(Booking.id).all())
+
+
+class IdempotencyKeys:
+    """Deletes idempotency keys once a retry can no longer reuse them.
+
+    A key only has to outlive the retries of the request that created it,
+    so keys older than IDEMPOTENCY_KEY_RETENTION_SECONDS are deleted by a
+    job every IDEMPOTENCY_KEY_PRUNE_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.retention_seconds = 86400
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, scheduler=None):
+        app.config.setdefault('IDEMPOTENCY_KEY_RETENTION_SECONDS', 86400)
+        app.config.setdefault('IDEMPOTENCY_KEY_PRUNE_INTERVAL_SECONDS', 3600)
+        self.app = app
+        self.retention_seconds = app.config['IDEMPOTENCY_KEY_RETENTION_SECONDS']
+        app.extensions['idempotency_keys'] = self
+        if scheduler is not None and app.config['IDEMPOTENCY_KEY_PRUNE_INTERVAL_SECONDS']:
+            scheduler.add_job(
+                self.run, 'interval',
+                seconds=app.config['IDEMPOTENCY_KEY_PRUNE_INTERVAL_SECONDS'],
+                id='idempotency-key-prune', replace_existing=True, max_instances=1, coalesce=True,
+            )
+
+    def prune(self):
+        """Delete keys older than the retention window; return how many were removed."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention_seconds)
+        removed = IdempotencyKey.query.filter(IdempotencyKey.created_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        return removed
+
+    def run(self):
+        """Scheduler entry point."""
+        app = self.app
+        with app.app_context():
+            try:
+                self.prune()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Idempotency key prune failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+
+idempotency_keys = IdempotencyKeys()
@@ -0,0 +1,111 @@
+import threading
+import time
+
+from metrics import metrics
+
+rejected = metrics.counter('chat_streams_rejected_total', 'Chat requests refused with a 503, by reason.', ('reason',))
+
+
+class Overloaded(Exception):
+    """Raised when a chat stream can't be admitted within the wait budget."""
+
+    def __init__(self, retry_after):
+        super().__init__("Chat is busy, please retry shortly.")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Caps concurrent upstream chat streams per process.
+
+    At most CHAT_MAX_STREAMS replies are generated at once. Up to
+    CHAT_MAX_QUEUED further requests wait (each for at most
+    CHAT_QUEUE_TIMEOUT_SECONDS) for a slot; beyond that requests are refused
+    immediately with Overloaded so a slow upstream model turns into quick
+    503s instead of every server thread being parked on /chat.
+    """
+
+    def __init__(self, app=None):
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.max_streams = 32
+        self.max_queued = 64
+        self.queue_timeout = 10
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CHAT_MAX_STREAMS', 32)
+        app.config.setdefault('CHAT_MAX_QUEUED', 64)
+        app.config.setdefault('CHAT_QUEUE_TIMEOUT_SECONDS', 10)
+        self.max_streams = app.config['CHAT_MAX_STREAMS']
+        self.max_queued = app.config['CHAT_MAX_QUEUED']
+        self.queue_timeout = app.config['CHAT_QUEUE_TIMEOUT_SECONDS']
+        app.extensions['chat_admission'] = self
+
+    def acquire(self):
+        with self._cond:
+            if self.active < self.max_streams:
+                self.active += 1
+                return
+            if self.waiting >= self.max_queued:
+                rejected.inc(reason='queue_full')
+                raise Overloaded(self.queue_timeout)
+            self.waiting += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self.active >= self.max_streams:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        rejected.inc(reason='timeout')
+                        raise Overloaded(self.queue_timeout)
+                    self._cond.wait(remaining)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def admit(self, events):
+        """Wrap an already admitted event stream so its slot is released on close."""
+        return AdmittedStream(self, events)
+
+
+class AdmittedStream:
+    """Response iterable that gives its admission slot back exactly once.
+
+    Werkzeug calls close() on the response iterable even if iteration never
+    started, which a plain generator's finally block wouldn't cover.
+    """
+
+    def __init__(self, controller, events):
+        self._controller = controller
+        self._events = iter(events)
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._events)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        close = getattr(self._events, 'close', None)
+        try:
+            if close is not None:
+                close()
+        finally:
+            self._controller.release()
+
+
+chat_admission = AdmissionController()
@@ -0,0 +1,59 @@
+import os
+import threading
+
+from metrics import metrics
+
+first_token_seconds = metrics.histogram(
+    'llm_time_to_first_token_seconds', 'Time from sending a chat turn to the model until its first token, by agent.',
+    ('agent',))
+turn_seconds = metrics.histogram(
+    'llm_turn_duration_seconds', 'Time for one model turn to finish streaming, by agent.', ('agent',))
+
+
+class ChatAgents:
+    """The chat agents and Swarm client, built on first use.
+
+    Importing openai/swarm costs more than the rest of create_app put
+    together, and CLI commands and workers that only serve pages never
+    need them, so nothing is imported until a chat arrives. The agents
+    are built once by the `build(Agent)` callable given to init_app; the
+    Swarm client (and its HTTP connection pool) is created per process,
+    so one made before a fork is never shared with the children.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._build = None
+        self._agents = None
+        self._client = None
+        self._client_pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, build=None):
+        self.app = app
+        self._build = build
+        self._agents = None
+        app.extensions['chat_agents'] = self
+
+    def get(self, name):
+        if self._agents is None:
+            with self._lock:
+                if self._agents is None:
+                    from swarm import Agent
+                    self._agents = self._build(Agent)
+        return self._agents[name]
+
+    @property
+    def client(self):
+        if self._client is None or self._client_pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._client_pid != os.getpid():
+                    from swarm import Swarm
+                    self._client = Swarm()
+                    self._client_pid = os.getpid()
+        return self._client
+
+
+chat_agents = ChatAgents()
@@ -0,0 +1,100 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Lowercase, drop punctuation and collapse whitespace."""
+    text = _PUNCTUATION.sub(" ", (text or "").lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class ResponseCache:
+    """LRU/TTL cache of general-agent replies.
+
+    Keys are the normalized question plus the normalized text of the
+    CHAT_CACHE_CONTEXT_MESSAGES messages before it, so the same question
+    asked in the same short context gets the same answer. Entries expire
+    after CHAT_CACHE_TTL_SECONDS and the cache never holds more than
+    CHAT_CACHE_MAX_ENTRIES (least recently used first out). Seeded entries
+    (the FAQ answers) never expire.
+    """
+
+    def __init__(self, app=None):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.ttl = 3600
+        self.max_entries = 1000
+        self.context_messages = 2
+        self.enabled = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CHAT_CACHE_ENABLED', True)
+        app.config.setdefault('CHAT_CACHE_TTL_SECONDS', 3600)
+        app.config.setdefault('CHAT_CACHE_MAX_ENTRIES', 1000)
+        app.config.setdefault('CHAT_CACHE_CONTEXT_MESSAGES', 2)
+        self.enabled = app.config['CHAT_CACHE_ENABLED']
+        self.ttl = app.config['CHAT_CACHE_TTL_SECONDS']
+        self.max_entries = app.config['CHAT_CACHE_MAX_ENTRIES']
+        self.context_messages = app.config['CHAT_CACHE_CONTEXT_MESSAGES']
+        app.extensions['chat_cache'] = self
+
+    def key(self, messages):
+        """Build the cache key for the last (user) message in `messages`."""
+        if not messages:
+            return None
+        question = normalize(messages[-1].get("content"))
+        if not question:
+            return None
+        context = messages[-1 - self.context_messages:-1] if self.context_messages else []
+        return (question,) + tuple(
+            (message.get("role"), normalize(message.get("content"))) for message in context
+        )
+
+    def get(self, key):
+        if not self.enabled or key is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry[1] is not None and entry[1] < now):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, content, ttl=None, pinned=False):
+        if not self.enabled or key is None or not content:
+            return
+        expires_at = None if pinned else time.monotonic() + (ttl or self.ttl)
+        with self._lock:
+            self._entries[key] = (content, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def seed(self, question, answer):
+        """Pin an answer for `question` asked as the opening message."""
+        self.set((normalize(question),), answer, pinned=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+chat_cache = ResponseCache()
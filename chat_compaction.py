@@ -0,0 +1,155 @@
+import json
+import re
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+DATE_RE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+TIME_RE = re.compile(r"\b(?:[01]?\d|2[0-3]):[0-5]\d(?:\s?[ap]\.?m\.?)?\b|\b(?:1[0-2]|0?[1-9])\s?[ap]\.?m\.?\b", re.IGNORECASE)
+SERVICE_RE = re.compile(r"\b(moving|cleaning|handyman)\b", re.IGNORECASE)
+
+# Booking facts worth carrying across compaction, in the order they are shown.
+FACT_KEYS = ('service', 'date', 'time', 'email')
+
+
+def estimate_tokens(message):
+    """Rough token count (about four characters per token, plus overhead)."""
+    text = message.get("content") or ""
+    if message.get("tool_calls"):
+        text += json.dumps(message["tool_calls"])
+    return len(text) // 4 + 4
+
+
+def extract_facts(text):
+    facts = {}
+    for key, pattern in (('email', EMAIL_RE), ('date', DATE_RE), ('time', TIME_RE), ('service', SERVICE_RE)):
+        match = pattern.search(text or "")
+        if match:
+            facts[key] = match.group(0).strip()
+    if 'service' in facts:
+        facts['service'] = facts['service'].capitalize()
+    return facts
+
+
+class HistoryCompactor:
+    """Keeps the prompt sent to the model under a fixed token budget.
+
+    The most recent messages that fit in CHAT_HISTORY_TOKEN_BUDGET are sent
+    as-is. Older messages are removed from the session and folded into a
+    running summary of at most CHAT_SUMMARY_TOKEN_BUDGET tokens, and booking
+    facts (service, date, time, email) seen anywhere in the conversation
+    are pinned, so the model keeps what it needs to finish a booking while
+    per-turn prompt size stays flat.
+
+    The tool round in progress (the last assistant message with tool calls
+    and the tool results after it) is never folded, even over budget, since
+    the model must see the results of the calls it just made. Tool results
+    longer than CHAT_TOOL_RESULT_TOKEN_BUDGET, such as large quote grids,
+    are cut short in the prompt instead.
+    """
+
+    def __init__(self, app=None):
+        self.token_budget = 1500
+        self.summary_budget = 300
+        self.tool_result_budget = 400
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CHAT_HISTORY_TOKEN_BUDGET', 1500)
+        app.config.setdefault('CHAT_SUMMARY_TOKEN_BUDGET', 300)
+        app.config.setdefault('CHAT_TOOL_RESULT_TOKEN_BUDGET', 400)
+        self.token_budget = app.config['CHAT_HISTORY_TOKEN_BUDGET']
+        self.summary_budget = app.config['CHAT_SUMMARY_TOKEN_BUDGET']
+        self.tool_result_budget = app.config['CHAT_TOOL_RESULT_TOKEN_BUDGET']
+        app.extensions['chat_compaction'] = self
+
+    def note_user_message(self, chat_session, content):
+        chat_session.facts.update(extract_facts(content))
+
+    def note_tool_call(self, chat_session, arguments):
+        """Tool arguments are the most reliable source of booking facts."""
+        if isinstance(arguments, dict):
+            for key in FACT_KEYS:
+                if arguments.get(key):
+                    chat_session.facts[key] = str(arguments[key])
+
+    def _truncate(self, message):
+        """`message`, with tool output over the tool result budget cut short."""
+        if message.get("role") != "tool" or estimate_tokens(message) <= self.tool_result_budget:
+            return message
+        content = message.get("content") or ""
+        limit = max(self.tool_result_budget - 4, 0) * 4
+        return dict(message, content=content[:limit] + f"\n[truncated {len(content) - limit} characters]")
+
+    def _window_start(self, messages):
+        # The newest message, or the whole tool round that ends the conversation.
+        keep = len(messages) - 1
+        while keep > 0 and messages[keep].get("role") == "tool":
+            keep -= 1
+        if not messages or messages[keep].get("role") != "assistant" or not messages[keep].get("tool_calls"):
+            keep = len(messages) - 1
+        used = 0
+        start = len(messages)
+        for i in range(len(messages) - 1, -1, -1):
+            used += estimate_tokens(self._truncate(messages[i]))
+            if used > self.token_budget and i < keep:
+                break
+            start = i
+        # Never open the window on tool results whose tool call was folded away.
+        while start < len(messages) and messages[start].get("role") == "tool":
+            start += 1
+        return start
+
+    def compact(self, chat_session):
+        """Fold messages that no longer fit the budget into the summary."""
+        messages = chat_session.messages
+        start = self._window_start(messages)
+        if start == 0:
+            return
+        folded, chat_session.messages = messages[:start], messages[start:]
+        lines = chat_session.summary.splitlines() if chat_session.summary else []
+        for message in folded:
+            line = _summary_line(message)
+            if line:
+                lines.append(line)
+        # Keep the most recent summary lines within the summary budget.
+        kept, used = [], 0
+        for line in reversed(lines):
+            used += len(line) // 4 + 1
+            if used > self.summary_budget:
+                break
+            kept.append(line)
+        chat_session.summary = "\n".join(reversed(kept))
+
+    def prompt(self, chat_session):
+        """Messages to send upstream: pinned context followed by the window."""
+        self.compact(chat_session)
+        context = []
+        facts = chat_session.facts
+        if facts:
+            context.append("Booking details so far: " + ", ".join(
+                f"{key}: {facts[key]}" for key in FACT_KEYS if key in facts))
+        if chat_session.summary:
+            context.append("Summary of earlier conversation:\n" + chat_session.summary)
+        window = [self._truncate(message) for message in chat_session.messages]
+        if not context:
+            return window
+        return [{"role": "system", "content": "\n\n".join(context)}] + window
+
+
+def _summary_line(message, limit=160):
+    role = message.get("role")
+    content = (message.get("content") or "").strip().replace("\n", " ")
+    if role == "tool":
+        return f"- {message.get('tool_name') or 'tool'} returned: {content[:limit]}"
+    if role == "assistant" and message.get("tool_calls"):
+        names = ", ".join(call["function"]["name"] for call in message["tool_calls"])
+        return f"- Assistant called {names}."
+    if not content:
+        return None
+    label = "Customer" if role == "user" else "Assistant"
+    if len(content) > limit:
+        content = content[:limit].rstrip() + "..."
+    return f"- {label}: {content}"
+
+
+chat_compaction = HistoryCompactor()
@@ -0,0 +1,117 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import ChatConversation
+
+GENERAL_AGENT = 'general'
+BOOKING_AGENT = 'booking'
+
+
+class ChatSession:
+    """Message list and routing state for one browser conversation."""
+
+    __slots__ = ('id', 'messages', 'agent', 'summary', 'facts')
+
+    def __init__(self, session_id, messages=None, agent=GENERAL_AGENT, summary="", facts=None):
+        self.id = session_id
+        self.messages = messages or []
+        self.agent = agent
+        # Filled in by chat_compaction as older turns are folded away.
+        self.summary = summary
+        self.facts = facts or {}
+
+    def add_user_message(self, content):
+        self.messages.append({"role": "user", "content": content})
+        # Routing is sticky: once the customer mentions booking, the booking
+        # agent keeps the conversation, so only the new message is inspected.
+        if self.agent == GENERAL_AGENT and "book" in content.lower():
+            self.agent = BOOKING_AGENT
+
+    def add_messages(self, messages):
+        self.messages.extend(messages)
+
+
+class ChatSessionStore:
+    """Conversation store keyed by session id, shared by every worker.
+
+    Each conversation is one ChatConversation row: it is loaded at the start
+    of a chat turn and saved as the reply streams (after every model round
+    and when the stream ends or the client goes away), so the next turn can
+    land on any gunicorn worker. Conversations idle for longer than
+    CHAT_SESSION_IDLE_SECONDS start over, and are deleted by a job every
+    CHAT_SESSION_PRUNE_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.idle_seconds = 1800
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, scheduler=None):
+        app.config.setdefault('CHAT_SESSION_IDLE_SECONDS', 1800)
+        app.config.setdefault('CHAT_SESSION_PRUNE_INTERVAL_SECONDS', 900)
+        self.app = app
+        self.idle_seconds = app.config['CHAT_SESSION_IDLE_SECONDS']
+        app.extensions['chat_sessions'] = self
+        if scheduler is not None and app.config['CHAT_SESSION_PRUNE_INTERVAL_SECONDS']:
+            scheduler.add_job(
+                self.run, 'interval',
+                seconds=app.config['CHAT_SESSION_PRUNE_INTERVAL_SECONDS'],
+                id='chat-session-prune', replace_existing=True, max_instances=1, coalesce=True,
+            )
+
+    def _cutoff(self):
+        return datetime.utcnow() - timedelta(seconds=self.idle_seconds)
+
+    def get(self, session_id=None):
+        """Return the stored session for `session_id`, or a new one."""
+        row = db.session.get(ChatConversation, session_id) if session_id else None
+        if row is None or (row.updated_at is not None and row.updated_at < self._cutoff()):
+            return ChatSession(session_id or uuid.uuid4().hex)
+        return ChatSession(row.id, json.loads(row.messages or '[]'), row.agent, row.summary or "",
+                           json.loads(row.facts or '{}'))
+
+    def save(self, chat_session):
+        """Write the session back and commit."""
+        try:
+            db.session.merge(ChatConversation(
+                id=chat_session.id,
+                agent=chat_session.agent,
+                messages=json.dumps(chat_session.messages, default=str),
+                summary=chat_session.summary,
+                facts=json.dumps(chat_session.facts),
+                updated_at=datetime.utcnow(),
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.app.logger.error(f"Could not save chat session {chat_session.id}: {str(e)}")
+
+    def discard(self, session_id):
+        ChatConversation.query.filter_by(id=session_id).delete(synchronize_session=False)
+        db.session.commit()
+
+    def prune(self):
+        """Delete idle conversations; return how many were removed."""
+        removed = ChatConversation.query.filter(ChatConversation.updated_at < self._cutoff()).delete(
+            synchronize_session=False)
+        db.session.commit()
+        return removed
+
+    def run(self):
+        """Scheduler entry point."""
+        app = self.app
+        with app.app_context():
+            try:
+                self.prune()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Chat session prune failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+
+chat_sessions = ChatSessionStore()
@@ -0,0 +1,103 @@
+import json
+import queue
+import threading
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Response headers that stop proxies (nginx, Heroku router) from buffering
+# the stream, so each event reaches the browser as soon as it is yielded.
+STREAM_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',
+}
+
+_END = object()
+
+
+def event(type, **fields):
+    """Encode one stream event as an NDJSON line.
+
+    Event types: ``delta`` (a piece of the reply, ``content``), ``tool_call``
+    (``name``, ``arguments``), ``tool_result`` (``name``, ``content``),
+    ``heartbeat``, ``error`` (``message``) and ``done``.
+    """
+    fields['type'] = type
+    return json.dumps(fields) + "\n"
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def with_heartbeats(events, app=None, heartbeat_seconds=15, max_buffer=256):
+    """Drain `events` on a helper thread and interleave heartbeat events.
+
+    A blocking upstream (the model taking its time before the first token,
+    or a tool call) would otherwise leave the connection silent long enough
+    for proxies to drop it. When the client disconnects the WSGI server
+    closes this generator; the helper thread notices and closes the
+    upstream iterator instead of generating a reply nobody will read.
+
+    The helper is a second thread per stream on top of the request thread,
+    which is what bounds CHAT_MAX_STREAMS per worker.
+    """
+    buffer = queue.Queue(max_buffer)
+    cancelled = threading.Event()
+
+    def put(item):
+        while not cancelled.is_set():
+            try:
+                buffer.put(item, timeout=heartbeat_seconds)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def pump():
+        context = app.app_context() if app is not None else None
+        if context is not None:
+            context.push()
+        try:
+            for item in events:
+                if not put(item):
+                    break
+        except Exception as e:
+            put(_Failure(e))
+        finally:
+            close = getattr(events, 'close', None)
+            if close is not None:
+                close()
+            put(_END)
+            if context is not None:
+                context.pop()
+
+    threading.Thread(target=pump, name='chat-stream', daemon=True).start()
+
+    try:
+        while True:
+            try:
+                item = buffer.get(timeout=heartbeat_seconds)
+            except queue.Empty:
+                yield event('heartbeat')
+                continue
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                if app is not None:
+                    app.logger.error(f"Error in chat stream: {str(item.error)}")
+                yield event('error', message="An error occurred while processing your request.")
+                yield event('done')
+                return
+            yield item
+    finally:
+        cancelled.set()
+
+
+def replay(content, chunk_words=4):
+    """Stream a stored reply with the same delta/done events as a live one."""
+    words = content.split(' ')
+    for i in range(0, len(words), chunk_words):
+        piece = ' '.join(words[i:i + chunk_words])
+        yield event('delta', content=piece if i == 0 else ' ' + piece)
+    yield event('done')
@@ -0,0 +1,183 @@
+import os
+import sqlite3
+from functools import wraps
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql import Select
+
+# SQLALCHEMY_BINDS key of the read pool
+READER = 'reader'
+
+# DB_ENGINE_PROFILE values
+PROFILE_PRODUCTION = 'production'  # tuned pools and pragmas, reads routed to READER
+PROFILE_BASIC = 'basic'            # Flask-SQLAlchemy defaults, one pool
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _is_sqlite_file(url):
+    url = make_url(url)
+    return (url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+            and url.query.get('mode') != 'memory')
+
+
+def _connection_class(pragmas):
+    """A sqlite3.Connection subclass that applies `pragmas` as it connects."""
+
+    class ProfiledConnection(sqlite3.Connection):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            for pragma in pragmas:
+                self.execute(f"PRAGMA {pragma}")
+
+    return ProfiledConnection
+
+
+def use_reader():
+    """Whether plain SELECTs in the current request may go to the read pool."""
+    if not has_request_context():
+        return False
+    return g.get('db_read_only', request.method in READ_METHODS)
+
+
+def read_only(view):
+    """Route a non-GET view's queries to the read pool; it must not write."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(Session):
+    """Session that sends read-only requests' SELECTs to the READER bind.
+
+    Everything else (flushes, bulk UPDATE/DELETE, raw SQL, background
+    jobs, POSTs) uses the default bind. Once a session has written, its
+    later reads stay on the default bind too, so a view always sees its
+    own changes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        engines = self._db.engines
+        if bind is not None or READER not in engines or engine is not engines.get(None):
+            return engine
+        if self._flushing or not isinstance(clause, Select):
+            self.info['db_wrote'] = True
+            return engine
+        if self.info.get('db_wrote') or not use_reader():
+            return engine
+        return engines[READER]
+
+
+class EngineProfile:
+    """Engine options for running under several gunicorn workers.
+
+    With the default SQLite database every worker used to open unpooled
+    rollback-journal connections, so one writer locked out all readers
+    and concurrent writers failed fast with "database is locked". The
+    production profile switches the file to WAL (readers no longer block
+    on, or block, the writer), relaxes fsyncs to synchronous=NORMAL, gives
+    connections a busy timeout and a larger page cache, and starts write
+    transactions with BEGIN IMMEDIATE so two writers queue on the busy
+    timeout instead of deadlocking on a lock upgrade. Reads from
+    GET/HEAD requests are served from a separate, larger, query_only
+    pool (see RoutingSession), so a burst of page views never waits
+    behind the write pool.
+
+    For other databases the profile only sizes the pool, and reads are
+    routed only if DATABASE_READ_URL points at a replica.
+
+    Must be initialised before db.init_app, which builds the engines.
+    Pools are emptied (without closing the parent's connections) in a
+    forked child, so an app preloaded by gunicorn is safe to fork.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        os.register_at_fork(after_in_child=self._after_fork)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if 'sqlalchemy' in app.extensions:
+            raise RuntimeError("engine_profile.init_app must be called before db.init_app")
+        app.config.setdefault('DB_ENGINE_PROFILE', PROFILE_PRODUCTION)
+        app.config.setdefault('DATABASE_READ_URL', None)
+        app.config.setdefault('DB_POOL_SIZE', 10)
+        app.config.setdefault('DB_MAX_OVERFLOW', 20)
+        app.config.setdefault('DB_POOL_TIMEOUT', 10)
+        app.config.setdefault('DB_READ_POOL_SIZE', 20)
+        app.config.setdefault('DB_READ_MAX_OVERFLOW', 40)
+        app.config.setdefault('SQLITE_JOURNAL_MODE', 'WAL')
+        app.config.setdefault('SQLITE_SYNCHRONOUS', 'NORMAL')
+        app.config.setdefault('SQLITE_BUSY_TIMEOUT_MS', 5000)
+        app.config.setdefault('SQLITE_CACHE_SIZE_KB', 32768)
+        app.config.setdefault('SQLITE_MMAP_SIZE', 128 * 1024 * 1024)
+        self.app = app
+        app.extensions['engine_profile'] = self
+
+        config = app.config
+        url = config.get('SQLALCHEMY_DATABASE_URI')
+        if config['DB_ENGINE_PROFILE'] != PROFILE_PRODUCTION or url is None:
+            return
+        sqlite_file = _is_sqlite_file(url)
+        if not sqlite_file and make_url(url).get_backend_name() == 'sqlite':
+            return  # in-memory: one static connection, nothing to tune
+
+        options = config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        for key, value in self._pool_options(config['DB_POOL_SIZE'], config['DB_MAX_OVERFLOW']).items():
+            options.setdefault(key, value)
+        if sqlite_file:
+            options.setdefault('connect_args', self._sqlite_connect_args(write=True))
+
+        read_url = config['DATABASE_READ_URL'] or (url if sqlite_file else None)
+        if read_url is not None:
+            reader = {'url': read_url, **self._pool_options(config['DB_READ_POOL_SIZE'], config['DB_READ_MAX_OVERFLOW'])}
+            if _is_sqlite_file(read_url):
+                reader['connect_args'] = self._sqlite_connect_args(write=False)
+            config.setdefault('SQLALCHEMY_BINDS', {}).setdefault(READER, reader)
+
+    def _after_fork(self):
+        app = self.app
+        if app is None or 'sqlalchemy' not in app.extensions:
+            return
+        with app.app_context():
+            for engine in app.extensions['sqlalchemy'].engines.values():
+                engine.dispose(close=False)
+
+    def _pool_options(self, size, overflow):
+        return {
+            'pool_size': size,
+            'max_overflow': overflow,
+            'pool_timeout': self.app.config['DB_POOL_TIMEOUT'],
+            'pool_pre_ping': True,
+        }
+
+    def _sqlite_connect_args(self, write):
+        config = self.app.config
+        pragmas = [
+            f"cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}",
+            f"mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+            'temp_store=MEMORY',
+        ]
+        if write:
+            # journal_mode is stored in the file; synchronous is per connection.
+            pragmas[:0] = [f"journal_mode={config['SQLITE_JOURNAL_MODE']}",
+                           f"synchronous={config['SQLITE_SYNCHRONOUS']}"]
+        else:
+            pragmas.append('query_only=ON')
+        return {
+            'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000,
+            'factory': _connection_class(pragmas),
+            # sqlite3 then opens a write transaction with BEGIN IMMEDIATE at
+            # the first INSERT/UPDATE/DELETE; the read pool stays deferred.
+            'isolation_level': 'IMMEDIATE' if write else 'DEFERRED',
+            'check_same_thread': False,
+        }
+
+
+engine_profile = EngineProfile()
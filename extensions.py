@@ -1,7 +1,34 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_mail import Mail
+from sqlalchemy import event
 
-db = SQLAlchemy()
+from db_profile import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 mail = Mail()
+
+
+def register_session_hooks(name, owner, **listeners):
+    """Listen for session events (after_commit=..., etc.) on behalf of `owner`.
+
+    Each `name` has one set of listeners: registering again for the same
+    owner does nothing, and a new owner (another app, e.g. in tests)
+    replaces the previous owner's listeners rather than adding to them.
+    """
+    session_cls = db.session.session_factory.class_
+    registered = session_cls.__dict__.get('_session_hooks')
+    if registered is None:
+        registered = session_cls._session_hooks = {}
+
+    previous = registered.get(name)
+    if previous is not None:
+        if previous[0] is owner:
+            return
+        for identifier, listener in previous[1].items():
+            event.remove(session_cls, identifier, listener)
+
+    for identifier, listener in listeners.items():
+        event.listen(session_cls, identifier, listener)
+    registered[name] = (owner, listeners)
@@ -0,0 +1,152 @@
+import os
+import socket
+import uuid
+from datetime import date as date_cls, datetime, timedelta
+
+from flask import render_template, url_for
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from mail_queue import mail_queue
+from models import Booking, FollowUp, SchedulerLease, Service
+
+LEASE_NAME = 'follow-up-sweep'
+
+REMINDER = 'reminder'
+FEEDBACK = 'feedback'
+
+
+class FollowUpScheduler:
+    """Reminder and feedback emails derived from Booking rows.
+
+    Nothing is scheduled per booking. Every process registers one interval
+    job; whichever process holds the SchedulerLease row runs the sweep,
+    which finds bookings whose reminder or feedback email is due, groups them
+    per customer and appointment, and enqueues one email per group. A
+    FollowUp row is written in the same transaction as the queued email and
+    is unique per (booking, kind), so restarts, lease hand-overs and
+    overlapping sweeps can't lose or duplicate a message.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._token = uuid.uuid4().hex[:8]
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, scheduler=None):
+        app.config.setdefault('FOLLOW_UP_INTERVAL_SECONDS', 300)
+        app.config.setdefault('FOLLOW_UP_FEEDBACK_LOOKBACK_DAYS', 7)
+        app.config.setdefault('SITE_URL', os.getenv('SITE_URL', 'http://localhost:5001'))
+        self.app = app
+        app.extensions['follow_ups'] = self
+        if scheduler is not None:
+            scheduler.add_job(
+                self.run, 'interval',
+                seconds=app.config['FOLLOW_UP_INTERVAL_SECONDS'],
+                id=LEASE_NAME, replace_existing=True, max_instances=1, coalesce=True,
+            )
+
+    @property
+    def holder(self):
+        # Resolved per call so forked workers never share a lease identity.
+        return f"{socket.gethostname()}:{os.getpid()}:{self._token}"
+
+    def run(self):
+        """Scheduler entry point: sweep if this process holds the lease."""
+        app = self.app
+        with app.app_context():
+            try:
+                if self.acquire_lease():
+                    self.sweep()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Follow-up sweep failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+    def acquire_lease(self):
+        now = datetime.utcnow()
+        ttl = timedelta(seconds=self.app.config['FOLLOW_UP_INTERVAL_SECONDS'] * 3)
+        claimed = SchedulerLease.query.filter(
+            SchedulerLease.name == LEASE_NAME,
+            db.or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now),
+        ).update({'holder': self.holder, 'expires_at': now + ttl}, synchronize_session=False)
+        if not claimed:
+            if db.session.get(SchedulerLease, LEASE_NAME) is not None:
+                db.session.rollback()
+                return False
+            db.session.add(SchedulerLease(name=LEASE_NAME, holder=self.holder, expires_at=now + ttl))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        return True
+
+    def sweep(self, today=None):
+        """Enqueue every reminder and feedback email that is due; return the count."""
+        today = today or date_cls.today()
+        tomorrow = today + timedelta(days=1)
+        lookback = today - timedelta(days=self.app.config['FOLLOW_UP_FEEDBACK_LOOKBACK_DAYS'])
+        yesterday = today - timedelta(days=1)
+
+        sent = self._send_due(REMINDER, tomorrow, tomorrow, self._reminder)
+        sent += self._send_due(FEEDBACK, lookback, yesterday, self._feedback)
+        return sent
+
+    def _due_bookings(self, kind, first_day, last_day):
+        """(id, email, date, time, service name) rows, read up front as plain tuples.
+
+        Loaded Booking objects would be expired by every per-group commit
+        and lazily reloaded, one booking and one service at a time.
+        """
+        return (
+            db.session.query(Booking.id, Booking.email, Booking.date, Booking.time, Service.name)
+            .outerjoin(Service, Service.id == Booking.service_id)
+            .outerjoin(FollowUp, db.and_(FollowUp.booking_id == Booking.id, FollowUp.kind == kind))
+            .filter(FollowUp.id.is_(None))
+            .filter(Booking.date >= first_day, Booking.date <= last_day)
+            .filter(db.or_(Booking.status.is_(None), Booking.status.notin_(('Cancelled', 'Canceled'))))
+            .order_by(Booking.email, Booking.date, Booking.time)
+            .all()
+        )
+
+    def _send_due(self, kind, first_day, last_day, render):
+        groups = {}
+        for booking_id, email, day, slot_time, service_name in self._due_bookings(kind, first_day, last_day):
+            if email:
+                groups.setdefault((email, day, slot_time), []).append((booking_id, service_name))
+
+        sent = 0
+        with self.app.test_request_context(base_url=self.app.config['SITE_URL']):
+            for (email, day, slot_time), bookings in groups.items():
+                # Legacy bookings whose service name matched no Service have none.
+                names = [service_name or 'Your booking' for _, service_name in bookings]
+                subject, html = render(names, day.isoformat(), slot_time.strftime('%H:%M') if slot_time else '')
+                db.session.add_all(FollowUp(booking_id=booking_id, kind=kind) for booking_id, _ in bookings)
+                mail_queue.enqueue(subject, [email], html=html, commit=False)
+                try:
+                    db.session.commit()
+                except IntegrityError:
+                    # Another sweep got there first.
+                    db.session.rollback()
+                    continue
+                sent += 1
+        return sent
+
+    def _reminder(self, services, date, time):
+        subject = "Your Marquise's Services Appointment Tomorrow"
+        html_content = render_template('email_templates/reminder_email.html',
+                                       services=services, date=date, time=time)
+        return subject, html_content
+
+    def _feedback(self, services, date, time):
+        subject = "How was your Marquise's Services experience?"
+        feedback_url = url_for('feedback', _external=True)
+        html_content = render_template('email_templates/feedback_request.html',
+                                       services=services, feedback_url=feedback_url)
+        return subject, html_content
+
+
+follow_ups = FollowUpScheduler()
@@ -0,0 +1,39 @@
+import gc
+import os
+
+# Threaded workers: a /chat stream parks a thread (mostly idle, waiting on
+# the model) instead of a whole sync worker, so booking and page traffic keep
+# flowing while many conversations are open. chat_admission caps how many of
+# those threads may be streaming at once.
+#
+# Each stream actually holds two threads: the request thread and the
+# with_heartbeats pump that reads the model, and a queued chat holds its
+# request thread while it waits. So a worker serves CHAT_MAX_STREAMS (32)
+# concurrent streams, not hundreds, and the default 128 threads are sized
+# as 32 streaming + 64 queued (CHAT_MAX_QUEUED) + 32 for everything else.
+# Raise GUNICORN_THREADS together with those two settings, or add workers.
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 128))
+
+# Streams can outlive the default 30s; heartbeats keep the connection alive.
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+keepalive = 5
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:' + os.getenv('PORT', '8000'))
+
+# Import and build the app once in the master and fork it into the workers,
+# so they share its pages copy-on-write. create_app opens no connections and
+# starts no threads, and the engine pools are reset in each child.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def pre_fork(server, worker):
+    # Keep the garbage collector from touching (and so copying) the
+    # master's objects in every worker.
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Start the scheduler now rather than on this worker's first request.
+    worker.wsgi.extensions['background_jobs'].start()
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from extensions import db, register_session_hooks
+from models import LoyaltyPoints, LoyaltyTransaction, User
+
+
+def _columns(obj):
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+
+
+class IdentityCache:
+    """Bounded TTL cache behind login_manager.user_loader.
+
+    Entries are plain column snapshots of a User and its LoyaltyPoints row,
+    not ORM instances, so they are safe to share between request threads.
+    A hit rebuilds the objects and merges them into the request's session
+    with load=False, which attaches them without a SELECT; loyalty_points is
+    pre-populated so touching it doesn't trigger a lazy load either.
+    Committed changes to a User, LoyaltyPoints or LoyaltyTransaction row
+    evict that user in this worker; other workers pick the change up when the entry's TTL runs out.
+    """
+
+    def __init__(self, app=None):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.ttl = 60
+        self.max_entries = 5000
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IDENTITY_CACHE_TTL_SECONDS', 60)
+        app.config.setdefault('IDENTITY_CACHE_MAX_ENTRIES', 5000)
+        self.ttl = app.config['IDENTITY_CACHE_TTL_SECONDS']
+        self.max_entries = app.config['IDENTITY_CACHE_MAX_ENTRIES']
+        app.extensions['identity_cache'] = self
+        _register_session_hooks(self)
+
+    def load(self, user_id):
+        entry = self._get(user_id)
+        if entry is not None:
+            return self._rebuild(*entry)
+
+        user = User.query.options(joinedload(User.loyalty_points)).get(user_id)
+        if user is None:
+            return None
+        loyalty_points = user.loyalty_points
+        self._put(user_id, (_columns(user), _columns(loyalty_points) if loyalty_points else None))
+        return user
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def _get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def _put(self, user_id, snapshot):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _rebuild(self, user_columns, points_columns):
+        existing = db.session.identity_map.get(inspect(User).identity_key_from_primary_key((user_columns['id'],)))
+        if existing is not None:
+            return existing
+        user = User(**user_columns)
+        loyalty_points = None
+        if points_columns is not None:
+            loyalty_points = LoyaltyPoints(**points_columns)
+            make_transient_to_detached(loyalty_points)
+        make_transient_to_detached(user)
+        set_committed_value(user, 'loyalty_points', loyalty_points)
+        if loyalty_points is not None:
+            set_committed_value(loyalty_points, 'user', user)
+        return db.session.merge(user, load=False)
+
+
+def _register_session_hooks(cache):
+    def collect_user_changes(session, flush_context):
+        changed = session.info.setdefault('identity_cache_changes', set())
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, User):
+                changed.add(obj.id)
+            elif isinstance(obj, (LoyaltyPoints, LoyaltyTransaction)):
+                # Balances change through bulk UPDATEs, so watch the ledger too.
+                changed.add(obj.user_id)
+
+    def evict_changed_users(session):
+        for user_id in session.info.pop('identity_cache_changes', ()):
+            cache.invalidate(user_id)
+
+    def discard_user_changes(session):
+        session.info.pop('identity_cache_changes', None)
+
+    register_session_hooks('identity_cache', cache,
+                           after_flush=collect_user_changes,
+                           after_commit=evict_changed_users,
+                           after_rollback=discard_user_changes)
+
+
+identity_cache = IdentityCache()
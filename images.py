@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import re
+
+import click
+from flask import current_app, request, url_for
+from flask.cli import AppGroup
+from markupsafe import Markup, escape
+
+IMAGE_DIR = 'images'
+DERIVED_DIR = 'images/derived'
+MANIFEST_FILE = 'images/manifest.json'
+
+# Gallery images either have a <name>.json sidecar with "alt" and "category",
+# or are named gallery-<category>-<description>.jpg.
+GALLERY_PREFIX = 'gallery-'
+
+DEFAULT_WIDTHS = (320, 640, 1024, 1600)
+THUMBNAIL_WIDTH = 240
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Derived files carry a content hash in their name, so they never change.
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+images_cli = AppGroup('images', help='Build responsive image derivatives.')
+
+
+def _key(name):
+    """Manifest key for an image; templates don't agree on .jpg vs .JPG."""
+    return os.path.splitext(os.path.basename(name))[0].lower()
+
+
+def _natural_key(name):
+    """Sort job2 before job10."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name.lower())]
+
+
+def gallery_entry(source_dir, filename):
+    """The gallery entry (src, alt, category) for a source image, or None if it isn't in the gallery."""
+    stem = os.path.splitext(filename)[0]
+    try:
+        with open(os.path.join(source_dir, f"{stem}.json")) as f:
+            sidecar = json.load(f)
+    except OSError:
+        sidecar = None
+    if sidecar is None:
+        if not stem.lower().startswith(GALLERY_PREFIX):
+            return None
+        category, _, description = stem[len(GALLERY_PREFIX):].partition('-')
+        sidecar = {'category': category.replace('_', ' ').title(),
+                   'alt': description.replace('-', ' ').replace('_', ' ').capitalize() or category.title()}
+    if not sidecar.get('category'):
+        return None
+    return {'src': filename, 'alt': sidecar.get('alt', ''), 'category': sidecar['category']}
+
+
+def gallery_entries(static_folder):
+    """Gallery entries for every source image in the gallery, in natural file name order."""
+    source_dir = os.path.join(static_folder, IMAGE_DIR)
+    filenames = sorted((name for name in os.listdir(source_dir) if name.lower().endswith(SOURCE_EXTENSIONS)),
+                       key=_natural_key)
+    return [entry for entry in (gallery_entry(source_dir, name) for name in filenames) if entry is not None]
+
+
+def build_derivatives(static_folder, widths=DEFAULT_WIDTHS, quality=75):
+    """Write resized WebP/JPEG copies and thumbnails of every source image.
+
+    Returns the manifest, which is also written to static/images/manifest.json
+    together with the gallery entries.
+    """
+    from PIL import Image, ImageOps
+
+    source_dir = os.path.join(static_folder, IMAGE_DIR)
+    output_dir = os.path.join(static_folder, DERIVED_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+
+    manifest = {'images': {}, 'gallery': gallery_entries(static_folder)}
+    for filename in sorted(os.listdir(source_dir)):
+        if not filename.lower().endswith(SOURCE_EXTENSIONS):
+            continue
+        path = os.path.join(source_dir, filename)
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:10]
+
+        with Image.open(path) as original:
+            image = ImageOps.exif_transpose(original).convert('RGB')
+        key = _key(filename)
+        entry = {'original': f"{IMAGE_DIR}/{filename}", 'width': image.width, 'height': image.height,
+                 'webp': [], 'jpeg': []}
+
+        targets = sorted({w for w in widths if w < image.width} | {min(max(widths), image.width)})
+        for width in targets:
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS)
+            for fmt, ext in (('webp', 'webp'), ('jpeg', 'jpg')):
+                name = f"{key}-{width}w.{digest}.{ext}"
+                resized.save(os.path.join(output_dir, name), fmt.upper(), quality=quality, optimize=True, progressive=True)
+                entry[fmt].append({'src': f"{DERIVED_DIR}/{name}", 'width': width})
+
+        thumb = ImageOps.fit(image, (THUMBNAIL_WIDTH, THUMBNAIL_WIDTH), Image.LANCZOS)
+        thumb_name = f"{key}-thumb.{digest}.webp"
+        thumb.save(os.path.join(output_dir, thumb_name), 'WEBP', quality=quality)
+        entry['thumbnail'] = f"{DERIVED_DIR}/{thumb_name}"
+        manifest['images'][key] = entry
+
+    # Drop derivatives of images that changed or were removed.
+    current = {item['src'].rsplit('/', 1)[1] for entry in manifest['images'].values()
+               for fmt in ('webp', 'jpeg') for item in entry[fmt]}
+    current |= {entry['thumbnail'].rsplit('/', 1)[1] for entry in manifest['images'].values()}
+    for name in os.listdir(output_dir):
+        if name not in current:
+            os.remove(os.path.join(output_dir, name))
+
+    with open(os.path.join(static_folder, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+@images_cli.command('build')
+@click.option('--quality', default=75, show_default=True, help='WebP/JPEG quality.')
+def build_command(quality):
+    """Generate derivatives and static/images/manifest.json."""
+    manifest = build_derivatives(current_app.static_folder, quality=quality)
+    image_manifest.reload()
+    click.echo(f"Built derivatives for {len(manifest['images'])} images, {len(manifest['gallery'])} in the gallery.")
+
+
+class ImageManifest:
+    """Read-only view of the derivative manifest and gallery metadata."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._manifest = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['image_manifest'] = self
+        app.cli.add_command(images_cli)
+        app.add_template_global(responsive_image)
+
+        @app.after_request
+        def cache_derived_images(response):
+            if response.status_code == 200 and request.path.startswith(f"{app.static_url_path}/{DERIVED_DIR}/"):
+                response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+            return response
+
+    def _load(self, name, default):
+        try:
+            with open(os.path.join(self.app.static_folder, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def reload(self):
+        self._manifest = None
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            self._manifest = self._load(MANIFEST_FILE, {})
+        return self._manifest
+
+    @property
+    def images(self):
+        return self.manifest.get('images', {})
+
+    def get(self, name):
+        return self.images.get(_key(name))
+
+    def gallery(self):
+        """Gallery entries (src, alt, category) recorded by `flask images build`.
+
+        Before the first build they are read from the source images instead.
+        """
+        if 'gallery' not in self.manifest:
+            self.manifest['gallery'] = gallery_entries(self.app.static_folder)
+        return self.manifest['gallery']
+
+
+def responsive_image(name, alt='', sizes='100vw', class_=None, eager=False):
+    """Render a <picture> with WebP/JPEG srcsets for a static image.
+
+    Falls back to a plain lazy-loaded <img> of the original when the image
+    has no derivatives (e.g. `flask images build` hasn't been run).
+    """
+    entry = image_manifest.get(name)
+    loading = 'eager' if eager else 'lazy'
+    class_attr = f' class="{escape(class_)}"' if class_ else ''
+    if entry is None:
+        src = url_for('static', filename=f"{IMAGE_DIR}/{name}")
+        return Markup(f'<img src="{src}" alt="{escape(alt)}"{class_attr} loading="{loading}" decoding="async">')
+
+    def srcset(fmt):
+        return ', '.join(f"{url_for('static', filename=item['src'])} {item['width']}w" for item in entry[fmt])
+
+    fallback = url_for('static', filename=entry['jpeg'][-1]['src'])
+    return Markup(
+        '<picture>'
+        f'<source type="image/webp" srcset="{srcset("webp")}" sizes="{escape(sizes)}">'
+        f'<img src="{fallback}" srcset="{srcset("jpeg")}" sizes="{escape(sizes)}" '
+        f'width="{entry["width"]}" height="{entry["height"]}" alt="{escape(alt)}"{class_attr} '
+        f'loading="{loading}" decoding="async">'
+        '</picture>'
+    )
+
+
+image_manifest = ImageManifest()
@@ -0,0 +1,293 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+
+# INGEST_DURABILITY values
+DURABILITY_NONE = 'none'    # in memory only; lost if the process dies
+DURABILITY_LOG = 'log'      # appended to a local log; survives a process crash
+DURABILITY_FSYNC = 'fsync'  # log is fsynced per submission; survives power loss
+
+
+class _AppendLog:
+    """Per-process JSON-lines log of submissions not yet committed.
+
+    The owning process holds an exclusive flock on the file for as long as
+    it lives, which is how other processes tell an orphaned log from a live
+    one.
+    """
+
+    def __init__(self, path, fsync):
+        self.path = path
+        self.fsync = fsync
+        self._file = open(path, 'a+', encoding='utf-8')
+        fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def write(self, record):
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def truncate(self):
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _read_pending(path):
+    """Entries in a log that have no commit marker after them."""
+    entries, committed = [], 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn final write
+            if 'committed' in record:
+                committed = max(committed, record['committed'])
+            else:
+                entries.append(record)
+    return [entry for entry in entries if entry['seq'] > committed]
+
+
+class WriteBehindQueue:
+    """Buffers low-priority inserts and group-commits them off the request.
+
+    Views call `submit(kind, payload)` with a JSON-serialisable payload;
+    the handler registered for `kind` turns it into rows later, on a
+    background thread that commits up to INGEST_BATCH_SIZE submissions per
+    transaction and never holds one back longer than INGEST_MAX_LATENCY_MS.
+    One write lock and fsync per batch instead of per form post keeps a
+    burst of contact-form traffic from queueing in front of bookings.
+
+    With INGEST_DURABILITY 'log' or 'fsync', each submission is appended to
+    a per-process log in INGEST_LOG_DIR before `submit` returns, commit
+    markers are appended after each batch, and the log is truncated once
+    everything in it has been committed. A process that starts replays the
+    pending entries of any log whose owner has died. Delivery is
+    at-least-once: a crash between a commit and its marker replays that
+    batch. When the buffer is full (INGEST_MAX_PENDING) or INGEST_ENABLED
+    is off, submissions are written synchronously instead.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._handlers = {}
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._log = None
+        self._log_lock = threading.Lock()
+        self._seq = 0
+        self._committed = 0
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.batches = 0
+        self.submitted = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('INGEST_ENABLED', True)
+        app.config.setdefault('INGEST_BATCH_SIZE', 100)
+        app.config.setdefault('INGEST_MAX_LATENCY_MS', 200)
+        app.config.setdefault('INGEST_MAX_PENDING', 10000)
+        app.config.setdefault('INGEST_DURABILITY', DURABILITY_LOG)
+        app.config.setdefault('INGEST_LOG_DIR', os.path.join(app.instance_path, 'ingest'))
+        app.config.setdefault('INGEST_RETRY_SECONDS', 1)
+        self.app = app
+        app.extensions['write_behind'] = self
+
+    def register(self, kind, handler, after_commit=None):
+        """`handler(payload)` adds rows to db.session; `after_commit()` runs once per committed batch."""
+        self._handlers[kind] = (handler, after_commit)
+
+    # Producer side
+
+    def submit(self, kind, payload):
+        if kind not in self._handlers:
+            raise KeyError(f"No write-behind handler registered for {kind!r}")
+        if not self.app.config['INGEST_ENABLED']:
+            return self._write_now(kind, payload)
+        self.start()
+        entry = {'kind': kind, 'payload': payload}
+        with self._log_lock:
+            full = self._queue.qsize() >= self.app.config['INGEST_MAX_PENDING']
+            if not full:
+                self._seq += 1
+                entry['seq'] = self._seq
+                if self._log is not None:
+                    self._log.write(entry)
+                self._queue.put(entry)
+        if full:
+            return self._write_now(kind, payload)
+        self.submitted += 1
+
+    def _write_now(self, kind, payload):
+        handler, after_commit = self._handlers[kind]
+        handler(payload)
+        db.session.commit()
+        if after_commit is not None:
+            after_commit()
+
+    @property
+    def pending(self):
+        """Submissions buffered in this process and not yet committed."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # Worker side
+
+    def start(self):
+        """Start this process's flusher (and replay orphaned logs) if needed."""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # Forked: nothing buffered in the parent belongs to us.
+                self._queue = queue.Queue()
+                self._seq = self._committed = 0
+                self._log = self._open_log()
+                self._pid = os.getpid()
+                atexit.register(self.stop)
+                self._recover()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        """Flush whatever is buffered and stop the flusher thread."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _open_log(self):
+        durability = self.app.config['INGEST_DURABILITY']
+        if durability == DURABILITY_NONE:
+            return None
+        log_dir = self.app.config['INGEST_LOG_DIR']
+        os.makedirs(log_dir, exist_ok=True)
+        path = os.path.join(log_dir, f"ingest-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.log")
+        return _AppendLog(path, fsync=durability == DURABILITY_FSYNC)
+
+    def _recover(self):
+        """Re-queue pending entries from logs whose owning process is gone."""
+        if self._log is None:
+            return
+        for path in glob.glob(os.path.join(self.app.config['INGEST_LOG_DIR'], 'ingest-*.log')):
+            if path == self._log.path:
+                continue
+            try:
+                with open(path, 'r+', encoding='utf-8') as orphan:
+                    fcntl.flock(orphan, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    pending = _read_pending(path)
+                    with self._log_lock:
+                        for entry in pending:
+                            self._seq += 1
+                            entry['seq'] = self._seq
+                            self._log.write(entry)
+                            self._queue.put(entry)
+                    os.remove(path)
+            except (BlockingIOError, FileNotFoundError):
+                continue  # still owned by a live process, or already recovered
+            if pending:
+                self.app.logger.warning(f"Recovered {len(pending)} write-behind entries from {path}")
+
+    def _collect(self):
+        config = self.app.config
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + config['INGEST_MAX_LATENCY_MS'] / 1000
+        while len(batch) < config['INGEST_BATCH_SIZE']:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        app = self.app
+        while True:
+            batch = self._collect()
+            if not batch:
+                if self._stopping.is_set():
+                    return
+                continue
+            with app.app_context():
+                try:
+                    self._flush(batch)
+                finally:
+                    db.session.remove()
+
+    def _flush(self, batch):
+        while True:
+            try:
+                self._commit(batch)
+                break
+            except OperationalError as e:
+                # Database locked or unreachable: keep the batch and retry.
+                db.session.rollback()
+                self.app.logger.error(f"Write-behind batch of {len(batch)} failed, retrying: {str(e)}")
+                if self._stopping.is_set():
+                    return
+                time.sleep(self.app.config['INGEST_RETRY_SECONDS'])
+            except Exception as e:
+                # A bad entry; commit the rest one at a time and drop it.
+                db.session.rollback()
+                self.app.logger.error(f"Write-behind batch of {len(batch)} failed: {str(e)}")
+                for entry in batch:
+                    try:
+                        self._commit([entry])
+                    except Exception as e:
+                        db.session.rollback()
+                        self.app.logger.error(f"Dropped write-behind {entry['kind']} entry: {str(e)}")
+                break
+        self._mark_committed(batch)
+
+    def _commit(self, batch):
+        callbacks = []
+        for entry in batch:
+            handler, after_commit = self._handlers[entry['kind']]
+            handler(entry['payload'])
+            if after_commit is not None and after_commit not in callbacks:
+                callbacks.append(after_commit)
+        db.session.commit()
+        self.batches += 1
+        for after_commit in callbacks:
+            after_commit()
+
+    def _mark_committed(self, batch):
+        with self._log_lock:
+            self._committed = max(self._committed, max(entry['seq'] for entry in batch))
+            if self._log is None:
+                return
+            if self._committed >= self._seq and self._queue.empty():
+                self._log.truncate()
+            else:
+                self._log.write({'committed': self._committed})
+
+
+write_behind = WriteBehindQueue()
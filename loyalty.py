@@ -0,0 +1,117 @@
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import LoyaltyPoints, LoyaltyTransaction
+
+BOOKING = 'booking'
+
+loyalty_cli = AppGroup('loyalty', help='Loyalty points maintenance.')
+
+
+class LoyaltyLedger:
+    """Append-only loyalty points ledger with a materialized balance.
+
+    Every change to a customer's points is a LoyaltyTransaction row, added
+    to the caller's session so it commits (or rolls back) together with the
+    booking that earned it. The LoyaltyPoints row is only ever changed with
+    a single `points = points + n` UPDATE in that same transaction, so
+    parallel bookings can't overwrite each other's increments. reconcile()
+    recomputes every balance from the ledger in bulk and corrects any that
+    have drifted; it runs every LOYALTY_RECONCILE_INTERVAL_SECONDS and from
+    `flask loyalty reconcile`.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, scheduler=None):
+        app.config.setdefault('LOYALTY_POINTS_PER_BOOKING', 100)
+        app.config.setdefault('LOYALTY_RECONCILE_INTERVAL_SECONDS', 86400)
+        self.app = app
+        app.extensions['loyalty_ledger'] = self
+        app.cli.add_command(loyalty_cli)
+        if scheduler is not None and app.config['LOYALTY_RECONCILE_INTERVAL_SECONDS']:
+            scheduler.add_job(
+                self.run, 'interval',
+                seconds=app.config['LOYALTY_RECONCILE_INTERVAL_SECONDS'],
+                id='loyalty-reconcile', replace_existing=True, max_instances=1, coalesce=True,
+            )
+
+    def award(self, user_id, points, reason, booking=None):
+        """Record a points change in the current transaction; the caller commits."""
+        db.session.add(LoyaltyTransaction(user_id=user_id, booking=booking, points=points, reason=reason))
+        if self._increment(user_id, points):
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(LoyaltyPoints(user_id=user_id, points=points, last_updated=datetime.utcnow()))
+        except IntegrityError:
+            # Another transaction created the balance row first.
+            self._increment(user_id, points)
+
+    def award_booking(self, user_id, booking):
+        self.award(user_id, current_app.config['LOYALTY_POINTS_PER_BOOKING'], BOOKING, booking)
+
+    def _increment(self, user_id, points):
+        return LoyaltyPoints.query.filter_by(user_id=user_id).update(
+            {'points': db.func.coalesce(LoyaltyPoints.points, 0) + points, 'last_updated': datetime.utcnow()},
+            synchronize_session=False,
+        )
+
+    def balance(self, user_id):
+        return db.session.query(LoyaltyPoints.points).filter_by(user_id=user_id).scalar() or 0
+
+    def reconcile(self):
+        """Rebuild balances from the ledger; return how many were corrected."""
+        ledger_total = (
+            db.select(db.func.coalesce(db.func.sum(LoyaltyTransaction.points), 0))
+            .where(LoyaltyTransaction.user_id == LoyaltyPoints.user_id)
+            .scalar_subquery()
+        )
+        missing = (
+            db.select(LoyaltyTransaction.user_id, db.func.sum(LoyaltyTransaction.points), db.func.max(LoyaltyTransaction.created_at))
+            .where(~db.exists().where(LoyaltyPoints.user_id == LoyaltyTransaction.user_id))
+            .group_by(LoyaltyTransaction.user_id)
+        )
+        created = db.session.execute(
+            db.insert(LoyaltyPoints).from_select(['user_id', 'points', 'last_updated'], missing)
+        ).rowcount
+        corrected = db.session.execute(
+            db.update(LoyaltyPoints)
+            .where(db.func.coalesce(LoyaltyPoints.points, 0) != ledger_total)
+            .values(points=ledger_total, last_updated=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        return created + corrected
+
+    def run(self):
+        """Scheduler entry point."""
+        app = self.app
+        with app.app_context():
+            try:
+                corrected = self.reconcile()
+                if corrected:
+                    app.logger.warning(f"Loyalty reconciliation corrected {corrected} balances")
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Loyalty reconciliation failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+
+@loyalty_cli.command('reconcile')
+def reconcile_command():
+    """Recompute every balance from the points ledger."""
+    corrected = loyalty_ledger.reconcile()
+    click.echo(f"Corrected {corrected} loyalty balances.")
+
+
+loyalty_ledger = LoyaltyLedger()
@@ -0,0 +1,299 @@
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from extensions import db
+from metrics import metrics
+from models import OutboundEmail
+
+smtp_send_seconds = metrics.histogram(
+    'smtp_send_duration_seconds', 'Time to hand one message to the SMTP server, by outcome.', ('outcome',))
+
+
+def is_permanent(error):
+    """Whether the server rejected the message for good (a 5xx reply).
+
+    SMTPRecipientsRefused, SMTPSenderRefused and SMTPDataError are also
+    raised for 4xx replies (greylisting, a full mailbox), which are worth
+    retrying; a refusal of every recipient is only permanent if each one
+    got a 5xx.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(code >= 500 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+class SMTPConnection:
+    """A reusable, authenticated SMTP connection owned by one worker thread."""
+
+    def __init__(self, host, port, use_tls=True, use_ssl=False, username=None, password=None,
+                 timeout=30, idle_seconds=60):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self._smtp = None
+        self._last_used = None
+
+    def _open(self):
+        smtp_cls = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        smtp = smtp_cls(self.host, self.port, timeout=self.timeout)
+        if self.use_tls and not self.use_ssl:
+            smtp.starttls()
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        return smtp
+
+    def get(self):
+        """Return a live connection, reconnecting if it went idle or dropped."""
+        now = datetime.utcnow()
+        if self._smtp is not None:
+            if self._last_used and (now - self._last_used).total_seconds() > self.idle_seconds:
+                try:
+                    self._smtp.noop()
+                except smtplib.SMTPException:
+                    self.close()
+                except OSError:
+                    self.close()
+        if self._smtp is None:
+            self._smtp = self._open()
+        self._last_used = now
+        return self._smtp
+
+    def send(self, message):
+        self.get().send_message(message)
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+
+class MailQueue:
+    """Persistent outbound mail queue.
+
+    Request handlers call `enqueue`, which only writes an OutboundEmail row.
+    Worker threads (started by the first `enqueue` in each process, or by
+    the mail-queue-drain job once the scheduler runs, so messages left
+    queued by a previous process go out after a restart) claim due rows in
+    batches, send each batch over a connection they keep open between
+    batches, and reschedule failures with exponential backoff. Claims go
+    through a single conditional UPDATE so several gunicorn workers can drain
+    the same table without sending a message twice.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, scheduler=None):
+        app.config.setdefault('MAIL_QUEUE_WORKERS', 2)
+        app.config.setdefault('MAIL_QUEUE_BATCH_SIZE', 20)
+        app.config.setdefault('MAIL_QUEUE_POLL_SECONDS', 5)
+        app.config.setdefault('MAIL_QUEUE_MAX_ATTEMPTS', 5)
+        app.config.setdefault('MAIL_QUEUE_RETRY_BASE_SECONDS', 30)
+        app.config.setdefault('MAIL_QUEUE_LEASE_SECONDS', 600)
+        app.config.setdefault('MAIL_USE_SSL', False)
+        self.app = app
+        app.extensions['mail_queue'] = self
+        if scheduler is not None:
+            scheduler.add_job(
+                self.run, 'interval',
+                seconds=app.config['MAIL_QUEUE_POLL_SECONDS'],
+                id='mail-queue-drain', replace_existing=True, max_instances=1, coalesce=True,
+            )
+
+    # Producer side
+
+    def enqueue(self, subject, recipients, html=None, body=None, sender=None, commit=True):
+        """Record a message for delivery and wake a worker.
+
+        With commit=False the row joins the caller's transaction, so the
+        message is only sent if that transaction commits.
+        """
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        email = OutboundEmail(
+            sender=sender or self.app.config.get('MAIL_DEFAULT_SENDER'),
+            recipients=','.join(recipients),
+            subject=subject,
+            html=html,
+            body=body,
+            status='queued',
+            attempts=0,
+            next_attempt_at=datetime.utcnow(),
+        )
+        db.session.add(email)
+        if commit:
+            db.session.commit()
+        self.start()
+        self._wakeup.set()
+        return email
+
+    # Worker side
+
+    def start(self):
+        """Start the worker threads for this process if they aren't running."""
+        if self._threads and all(thread.is_alive() for thread in self._threads):
+            return
+        with self._start_lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            app = self.app
+            for i in range(len(self._threads), app.config['MAIL_QUEUE_WORKERS']):
+                thread = threading.Thread(target=self._run, args=(app,), name=f'mail-queue-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def run(self):
+        """Scheduler entry point: make sure the workers are draining the table."""
+        self.start()
+        self._wakeup.set()
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stopping.clear()
+
+    def _connection(self, app):
+        config = app.config
+        return SMTPConnection(
+            config['MAIL_SERVER'],
+            config['MAIL_PORT'],
+            use_tls=config['MAIL_USE_TLS'],
+            use_ssl=config['MAIL_USE_SSL'],
+            username=config.get('MAIL_USERNAME'),
+            password=config.get('MAIL_PASSWORD'),
+        )
+
+    def _run(self, app):
+        connection = self._connection(app)
+        poll = app.config['MAIL_QUEUE_POLL_SECONDS']
+        try:
+            while not self._stopping.is_set():
+                with app.app_context():
+                    try:
+                        sent = self.process_batch(connection)
+                    except Exception as e:
+                        app.logger.error(f"Mail queue worker error: {str(e)}")
+                        db.session.rollback()
+                        sent = 0
+                    finally:
+                        db.session.remove()
+                if not sent:
+                    self._wakeup.wait(poll)
+                    self._wakeup.clear()
+        finally:
+            connection.close()
+
+    def claim_batch(self):
+        """Atomically claim up to MAIL_QUEUE_BATCH_SIZE due messages."""
+        config = self.app.config
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=config['MAIL_QUEUE_LEASE_SECONDS'])
+        # Release claims from workers that died mid-send.
+        OutboundEmail.query.filter(
+            OutboundEmail.status == 'sending', OutboundEmail.claimed_at < stale
+        ).update({'status': 'queued', 'claim_token': None}, synchronize_session=False)
+
+        due_ids = [
+            row.id for row in db.session.query(OutboundEmail.id)
+            .filter(OutboundEmail.status == 'queued', OutboundEmail.next_attempt_at <= now)
+            .order_by(OutboundEmail.next_attempt_at)
+            .limit(config['MAIL_QUEUE_BATCH_SIZE'])
+        ]
+        if not due_ids:
+            db.session.commit()
+            return []
+
+        token = uuid.uuid4().hex
+        OutboundEmail.query.filter(
+            OutboundEmail.id.in_(due_ids), OutboundEmail.status == 'queued'
+        ).update({'status': 'sending', 'claim_token': token, 'claimed_at': now}, synchronize_session=False)
+        db.session.commit()
+        return OutboundEmail.query.filter_by(claim_token=token, status='sending').all()
+
+    def process_batch(self, connection):
+        """Send one claimed batch over `connection`; return how many were sent."""
+        batch = self.claim_batch()
+        sent = 0
+        for email in batch:
+            start = time.perf_counter()
+            try:
+                connection.send(build_message(email))
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                permanent = is_permanent(e)
+                smtp_send_seconds.observe(time.perf_counter() - start, outcome='rejected' if permanent else 'deferred')
+                self._fail(email, e, permanent=permanent)
+            except (smtplib.SMTPException, OSError) as e:
+                smtp_send_seconds.observe(time.perf_counter() - start, outcome='error')
+                connection.close()
+                self._fail(email, e)
+            else:
+                smtp_send_seconds.observe(time.perf_counter() - start, outcome='sent')
+                email.status = 'sent'
+                email.sent_at = datetime.utcnow()
+                email.attempts = (email.attempts or 0) + 1
+                email.claim_token = None
+                sent += 1
+        if batch:
+            db.session.commit()
+        return sent
+
+    def depth(self):
+        """Messages waiting to be sent, by status ('queued' or 'sending')."""
+        rows = (
+            db.session.query(OutboundEmail.status, db.func.count(OutboundEmail.id))
+            .filter(OutboundEmail.status.in_(('queued', 'sending')))
+            .group_by(OutboundEmail.status)
+        )
+        counts = {('queued',): 0, ('sending',): 0}
+        counts.update({(status,): count for status, count in rows})
+        return counts
+
+    def _fail(self, email, error, permanent=False):
+        config = self.app.config
+        email.attempts = (email.attempts or 0) + 1
+        email.last_error = str(error)[:500]
+        email.claim_token = None
+        if permanent or email.attempts >= config['MAIL_QUEUE_MAX_ATTEMPTS']:
+            email.status = 'failed'
+            self.app.logger.error(f"Giving up on email {email.id} to {email.recipients}: {error}")
+        else:
+            delay = config['MAIL_QUEUE_RETRY_BASE_SECONDS'] * 2 ** (email.attempts - 1)
+            email.status = 'queued'
+            email.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+
+def build_message(email):
+    message = EmailMessage()
+    message['From'] = email.sender
+    message['To'] = email.recipients
+    message['Subject'] = email.subject
+    message.set_content(email.body or '')
+    if email.html:
+        message.add_alternative(email.html, subtype='html')
+    return message
+
+
+mail_queue = MailQueue()
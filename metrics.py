@@ -0,0 +1,288 @@
+import bisect
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, g, has_request_context, request
+from sqlalchemy import event
+
+from extensions import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, (None, 0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            values = sorted((key, list(counts), total) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Callback(_Metric):
+    """A gauge (or counter kept elsewhere) read when /metrics is scraped.
+
+    `read()` returns a number, or a dict of label-value tuples to numbers.
+    """
+
+    def __init__(self, name, help, read, labels=(), type='gauge'):
+        super().__init__(name, help, labels)
+        self.read = read
+        self.type = type
+
+    def _samples(self):
+        values = self.read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Metrics:
+    """Process-local instrumentation, exposed in Prometheus text format.
+
+    Every request is timed per endpoint, and every SQL statement per
+    engine; the statements a request issues are also counted and summed
+    against its endpoint. Other modules define their own histograms and
+    counters (SMTP sends, LLM calls) with `histogram`/`counter`, and
+    create_app registers read-at-scrape gauges such as queue depths with
+    `callback`. GET /metrics renders them all.
+
+    /metrics answers 404 until it is turned on: set METRICS_TOKEN and
+    scrape with `Authorization: Bearer <token>`, and/or list the scraper's
+    addresses in METRICS_ALLOWED_IPS (comma-separated; compared with
+    request.remote_addr, so behind a proxy that must pass the client
+    address through, e.g. with ProxyFix).
+
+    With METRICS_SLOW_REQUEST_MS set, a request slower than that is logged
+    with its query count and its METRICS_SLOW_REQUEST_TOP_QUERIES slowest
+    statements.
+
+    Values are per process: with several gunicorn workers each scrape
+    sees whichever worker answered, so scrape each worker or sum over
+    the series Prometheus keeps per target.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.requests = self.histogram(
+            'http_request_duration_seconds', 'Time to produce a response, by endpoint.',
+            ('endpoint', 'method', 'status'))
+        self.request_queries = self.histogram(
+            'http_request_sql_queries', 'SQL statements issued per request, by endpoint.',
+            ('endpoint',), buckets=QUERY_COUNT_BUCKETS)
+        self.request_query_seconds = self.histogram(
+            'http_request_sql_duration_seconds', 'Total SQL time per request, by endpoint.', ('endpoint',))
+        self.queries = self.histogram(
+            'db_query_duration_seconds', 'SQL statement execution time, by engine.', ('bind',))
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.config.setdefault('METRICS_ALLOWED_IPS', ())
+        app.config.setdefault('METRICS_SLOW_REQUEST_MS', None)
+        app.config.setdefault('METRICS_SLOW_REQUEST_TOP_QUERIES', 5)
+        self.app = app
+        app.extensions['metrics'] = self
+        if not app.config['METRICS_ENABLED']:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+        with app.app_context():
+            for bind, engine in db.engines.items():
+                self._instrument(engine, bind or 'default')
+
+    # Registry
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name, help, read, labels=(), type='gauge'):
+        """Register (or replace) a metric whose value is read at scrape time."""
+        with self._lock:
+            self._metrics[name] = Callback(name, help, read, labels, type)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                self.app.logger.error(f"Could not read metric {metric.name}: {str(e)}")
+        return '\n'.join(lines) + '\n'
+
+    def _allowed(self):
+        config = self.app.config
+        token = config['METRICS_TOKEN']
+        if token and hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+            return True
+        return request.remote_addr in config['METRICS_ALLOWED_IPS']
+
+    def view(self):
+        config = self.app.config
+        if not config['METRICS_TOKEN'] and not config['METRICS_ALLOWED_IPS']:
+            abort(404)
+        if not self._allowed():
+            abort(401 if config['METRICS_TOKEN'] else 404)
+        return Response(self.render(), content_type=CONTENT_TYPE)
+
+    # Requests
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_query_seconds = 0.0
+        g.metrics_statements = [] if self.app.config['METRICS_SLOW_REQUEST_MS'] else None
+
+    def _after_request(self, response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unmatched'
+        self.requests.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+        self.request_queries.observe(g.metrics_queries, endpoint=endpoint)
+        self.request_query_seconds.observe(g.metrics_query_seconds, endpoint=endpoint)
+
+        slow_ms = self.app.config['METRICS_SLOW_REQUEST_MS']
+        if slow_ms and elapsed * 1000 >= slow_ms:
+            top = sorted(g.metrics_statements, key=lambda item: item[0], reverse=True)
+            top = top[:self.app.config['METRICS_SLOW_REQUEST_TOP_QUERIES']]
+            queries = ''.join(f"\n  {seconds * 1000:.1f} ms  {' '.join(statement.split())[:300]}"
+                              for seconds, statement in top)
+            self.app.logger.warning(
+                f"Slow request {request.method} {request.path} ({endpoint}): {elapsed * 1000:.0f} ms, "
+                f"{g.metrics_queries} queries in {g.metrics_query_seconds * 1000:.0f} ms{queries}"
+            )
+        return response
+
+    # SQL
+
+    def _instrument(self, engine, bind):
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.get('metrics_started')
+            if not started:
+                return
+            elapsed = time.perf_counter() - started.pop()
+            self.queries.observe(elapsed, bind=bind)
+            if has_request_context() and 'metrics_start' in g:
+                g.metrics_queries += 1
+                g.metrics_query_seconds += elapsed
+                if g.metrics_statements is not None:
+                    g.metrics_statements.append((elapsed, statement))
+
+        @event.listens_for(engine, 'handle_error')
+        def handle_error(context):
+            if context.connection is not None:
+                started = context.connection.info.get('metrics_started')
+                if started:
+                    started.pop()
+
+
+metrics = Metrics()
@@ -0,0 +1,79 @@
+"""delivery tables
+
+Tables added alongside the baseline models before migrations existed:
+booking idempotency keys, the outbound mail queue, scheduler leases and
+the follow-up email log. Databases stamped with 0001_baseline get them
+here on upgrade.
+
+Revision ID: 0001b_delivery_tables
+Revises: 0001_baseline
+Create Date: 2026-10-18 14:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001b_delivery_tables'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('idempotency_key',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('booking_ids', sa.String(length=500), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_table('outbound_email',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sender', sa.String(length=100), nullable=True),
+    sa.Column('recipients', sa.Text(), nullable=False),
+    sa.Column('subject', sa.String(length=200), nullable=False),
+    sa.Column('html', sa.Text(), nullable=True),
+    sa.Column('body', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('claim_token', sa.String(length=32), nullable=True),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('outbound_email', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_outbound_email_claim_token'), ['claim_token'], unique=False)
+        batch_op.create_index(batch_op.f('ix_outbound_email_next_attempt_at'), ['next_attempt_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_outbound_email_status'), ['status'], unique=False)
+
+    op.create_table('scheduler_lease',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('holder', sa.String(length=100), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('follow_up',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('booking_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['booking_id'], ['booking.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('booking_id', 'kind', name='uq_follow_up_booking_kind')
+    )
+
+
+def downgrade():
+    op.drop_table('follow_up')
+    op.drop_table('scheduler_lease')
+    with op.batch_alter_table('outbound_email', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_outbound_email_status'))
+        batch_op.drop_index(batch_op.f('ix_outbound_email_next_attempt_at'))
+        batch_op.drop_index(batch_op.f('ix_outbound_email_claim_token'))
+
+    op.drop_table('outbound_email')
+    op.drop_table('idempotency_key')
@@ -0,0 +1,172 @@
+"""typed booking columns
+
+Replace Booking's free-text service/date/time columns with a service_id
+foreign key and real Date/Time columns, and index the columns that the
+profile, dashboard, availability and follow-up queries filter on.
+
+Existing rows are backfilled in chunks. Service names are matched to
+Service rows case-insensitively. A name with no match leaves service_id
+NULL rather than adding a bookable Service; each such name is logged with
+the ids of its bookings so they can be reassigned by hand. Dates and
+times that can't be parsed are left NULL.
+
+Revision ID: 0002_typed_booking_columns
+Revises: 0001b_delivery_tables
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+import logging
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_typed_booking_columns'
+down_revision = '0001b_delivery_tables'
+branch_labels = None
+depends_on = None
+
+CHUNK_SIZE = 10000
+LOGGED_IDS = 50
+
+log = logging.getLogger('alembic.runtime.migration')
+
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%B %d, %Y', '%b %d, %Y')
+TIME_FORMATS = ('%H:%M', '%H:%M:%S', '%I:%M %p', '%I:%M%p', '%I %p', '%I%p')
+
+service = sa.table(
+    'service',
+    sa.column('id', sa.Integer),
+    sa.column('name', sa.String),
+    sa.column('price_per_hour', sa.Float),
+)
+
+
+def _parse(value, formats, convert):
+    if value is None:
+        return None
+    text = str(value).strip().upper().replace('.', '')
+    for fmt in formats:
+        try:
+            return convert(datetime.strptime(text, fmt))
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_date(value):
+    return _parse(value, DATE_FORMATS, datetime.date)
+
+
+def _parse_time(value):
+    return _parse(value, TIME_FORMATS, datetime.time)
+
+
+def _service_ids(connection):
+    ids = {}
+    for service_id, name in connection.execute(sa.select(service.c.id, service.c.name).order_by(service.c.id)):
+        ids.setdefault(name.strip().lower(), service_id)
+    return ids
+
+
+def _backfill(connection):
+    service_ids = _service_ids(connection)
+    unmatched = {}
+    update = sa.text(
+        "UPDATE booking SET service_id = :service_id, date_new = :date_new, time_new = :time_new WHERE id = :id"
+    ).bindparams(
+        sa.bindparam('date_new', type_=sa.Date()),
+        sa.bindparam('time_new', type_=sa.Time()),
+    )
+    last_id = 0
+    while True:
+        rows = connection.execute(sa.text(
+            "SELECT id, service, date, time FROM booking WHERE id > :last_id ORDER BY id LIMIT :limit"
+        ), {'last_id': last_id, 'limit': CHUNK_SIZE}).all()
+        if not rows:
+            break
+        params = []
+        for row in rows:
+            name = (row.service or '').strip()
+            service_id = service_ids.get(name.lower())
+            if service_id is None and name:
+                unmatched.setdefault(name, []).append(row.id)
+            params.append({
+                'id': row.id,
+                'service_id': service_id,
+                'date_new': _parse_date(row.date),
+                'time_new': _parse_time(row.time),
+            })
+        connection.execute(update, params)
+        last_id = rows[-1].id
+
+    for name, booking_ids in sorted(unmatched.items()):
+        shown = ', '.join(str(booking_id) for booking_id in booking_ids[:LOGGED_IDS])
+        more = f" and {len(booking_ids) - LOGGED_IDS} more" if len(booking_ids) > LOGGED_IDS else ''
+        log.warning(f"No Service named {name!r}; {len(booking_ids)} bookings left without a service_id "
+                    f"(ids {shown}{more})")
+
+
+def upgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('service_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('date_new', sa.Date(), nullable=True))
+        batch_op.add_column(sa.Column('time_new', sa.Time(), nullable=True))
+
+    _backfill(op.get_bind())
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_column('service')
+        batch_op.drop_column('date')
+        batch_op.drop_column('time')
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.alter_column('date_new', new_column_name='date', existing_type=sa.Date())
+        batch_op.alter_column('time_new', new_column_name='time', existing_type=sa.Time())
+        batch_op.create_foreign_key('fk_booking_service_id_service', 'service', ['service_id'], ['id'])
+
+    op.create_index(op.f('ix_booking_email'), 'booking', ['email'], unique=False)
+    op.create_index(op.f('ix_booking_date'), 'booking', ['date'], unique=False)
+    op.create_index('ix_booking_service_id_date', 'booking', ['service_id', 'date'], unique=False)
+    op.create_index('ix_booking_user_id_date', 'booking', ['user_id', 'date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_booking_user_id_date', table_name='booking')
+    op.drop_index('ix_booking_service_id_date', table_name='booking')
+    op.drop_index(op.f('ix_booking_date'), table_name='booking')
+    op.drop_index(op.f('ix_booking_email'), table_name='booking')
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_booking_service_id_service', type_='foreignkey')
+        batch_op.alter_column('date', new_column_name='date_new', existing_type=sa.Date())
+        batch_op.alter_column('time', new_column_name='time_new', existing_type=sa.Time())
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('service', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('date', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('time', sa.String(length=100), nullable=True))
+
+    op.execute(
+        "UPDATE booking SET service = (SELECT name FROM service WHERE service.id = booking.service_id)"
+    )
+    connection = op.get_bind()
+    rows = connection.execute(sa.text(
+        "SELECT id, date_new, time_new FROM booking"
+    ).columns(sa.column('id', sa.Integer), sa.column('date_new', sa.Date), sa.column('time_new', sa.Time))).all()
+    if rows:
+        connection.execute(sa.text("UPDATE booking SET date = :date, time = :time WHERE id = :id"), [
+            {
+                'id': row.id,
+                'date': row.date_new.isoformat() if row.date_new else None,
+                'time': row.time_new.strftime('%H:%M') if row.time_new else None,
+            }
+            for row in rows
+        ])
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_column('time_new')
+        batch_op.drop_column('date_new')
+        batch_op.drop_column('service_id')
@@ -0,0 +1,26 @@
+"""referral history index
+
+Index the referrals a user has made by date, for the keyset-paginated
+dashboard.
+
+Revision ID: 0003_referral_history_index
+Revises: 0002_typed_booking_columns
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_referral_history_index'
+down_revision = '0002_typed_booking_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_referral_referrer_id_date_referred', 'referral', ['referrer_id', 'date_referred'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_referral_referrer_id_date_referred', table_name='referral')
@@ -0,0 +1,63 @@
+"""loyalty ledger
+
+Add the append-only loyalty_transaction ledger. Each user's current
+balance is carried over as an opening_balance entry. Duplicate
+loyalty_points rows are merged, so balances can be kept unique per user.
+
+Revision ID: 0004_loyalty_ledger
+Revises: 0003_referral_history_index
+Create Date: 2026-10-18 13:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_loyalty_ledger'
+down_revision = '0003_referral_history_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('loyalty_transaction',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('booking_id', sa.Integer(), nullable=True),
+    sa.Column('points', sa.Integer(), nullable=False),
+    sa.Column('reason', sa.String(length=50), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['booking_id'], ['booking.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('booking_id', 'reason', name='uq_loyalty_transaction_booking_reason')
+    )
+    with op.batch_alter_table('loyalty_transaction', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_loyalty_transaction_user_id'), ['user_id'], unique=False)
+
+    op.execute(
+        "INSERT INTO loyalty_transaction (user_id, points, reason, created_at) "
+        "SELECT user_id, SUM(COALESCE(points, 0)), 'opening_balance', CURRENT_TIMESTAMP "
+        "FROM loyalty_points GROUP BY user_id HAVING SUM(COALESCE(points, 0)) != 0"
+    )
+    op.execute(
+        "UPDATE loyalty_points SET points = (SELECT SUM(COALESCE(other.points, 0)) FROM loyalty_points AS other "
+        "WHERE other.user_id = loyalty_points.user_id)"
+    )
+    op.execute(
+        "DELETE FROM loyalty_points WHERE id NOT IN (SELECT MIN(id) FROM loyalty_points GROUP BY user_id)"
+    )
+
+    with op.batch_alter_table('loyalty_points', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_loyalty_points_user_id', ['user_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('loyalty_points', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_loyalty_points_user_id', type_='unique')
+
+    with op.batch_alter_table('loyalty_transaction', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_loyalty_transaction_user_id'))
+
+    op.drop_table('loyalty_transaction')
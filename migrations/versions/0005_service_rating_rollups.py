@@ -0,0 +1,53 @@
+"""service rating rollups
+
+Add the per-service service_rating rollup and backfill its counts and
+histogram from feedback. Top comments are filled in by
+`flask ratings rebuild` (or the first scheduled rebuild).
+
+Revision ID: 0005_service_rating_rollups
+Revises: 0004_loyalty_ledger
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_service_rating_rollups'
+down_revision = '0004_loyalty_ledger'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('service_rating',
+    sa.Column('service_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('rating_sum', sa.Integer(), nullable=False),
+    sa.Column('stars_1', sa.Integer(), nullable=False),
+    sa.Column('stars_2', sa.Integer(), nullable=False),
+    sa.Column('stars_3', sa.Integer(), nullable=False),
+    sa.Column('stars_4', sa.Integer(), nullable=False),
+    sa.Column('stars_5', sa.Integer(), nullable=False),
+    sa.Column('top_comments', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['service_id'], ['service.id'], ),
+    sa.PrimaryKeyConstraint('service_id')
+    )
+    op.create_index('ix_feedback_service_id_date_submitted', 'feedback', ['service_id', 'date_submitted'], unique=False)
+
+    buckets = ', '.join(
+        f"SUM(CASE WHEN CAST(rating AS INTEGER) = {stars} THEN 1 ELSE 0 END)" for stars in range(1, 6)
+    )
+    op.execute(
+        "INSERT INTO service_rating (service_id, count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5, "
+        "updated_at) "
+        f"SELECT service_id, COUNT(*), SUM(CAST(rating AS INTEGER)), {buckets}, CURRENT_TIMESTAMP "
+        "FROM feedback WHERE CAST(rating AS INTEGER) BETWEEN 1 AND 5 GROUP BY service_id"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_feedback_service_id_date_submitted', table_name='feedback')
+    op.drop_table('service_rating')
@@ -0,0 +1,40 @@
+"""chat conversations
+
+Store chat conversations in the database so every worker can serve the
+next turn of a conversation.
+
+Revision ID: 0006_chat_conversations
+Revises: 0005_service_rating_rollups
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_chat_conversations'
+down_revision = '0005_service_rating_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chat_conversation',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('agent', sa.String(length=20), nullable=False),
+    sa.Column('messages', sa.Text(), nullable=True),
+    sa.Column('summary', sa.Text(), nullable=True),
+    sa.Column('facts', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('chat_conversation', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chat_conversation_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('chat_conversation', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chat_conversation_updated_at'))
+
+    op.drop_table('chat_conversation')
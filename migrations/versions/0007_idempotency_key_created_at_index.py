@@ -0,0 +1,28 @@
+"""idempotency key created_at index
+
+Index idempotency keys by creation time, for the job that deletes
+expired keys.
+
+Revision ID: 0007_idempotency_key_created_at_index
+Revises: 0006_chat_conversations
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_idempotency_key_created_at_index'
+down_revision = '0006_chat_conversations'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('idempotency_key', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_idempotency_key_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('idempotency_key', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_idempotency_key_created_at'))
@@ -21,13 +21,20 @@ class User(UserMixin, db.Model):
 class Booking(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100))
-    email = db.Column(db.String(100))
-    service = db.Column(db.String(100))
-    date = db.Column(db.String(100))
-    time = db.Column(db.String(100))  # Add this line
+    email = db.Column(db.String(100), index=True)
+    service_id = db.Column(db.Integer, db.ForeignKey('service.id'))
+    date = db.Column(db.Date, index=True)
+    time = db.Column(db.Time)
     status = db.Column(db.String(50), default='Pending')
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
 
+    service = db.relationship('Service', backref=db.backref('bookings', lazy='dynamic'))
+
+    __table_args__ = (
+        db.Index('ix_booking_service_id_date', 'service_id', 'date'),
+        db.Index('ix_booking_user_id_date', 'user_id', 'date'),
+    )
+
     def get_modify_token(self, expires_sec=3600):
         s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
         return s.dumps({'booking_id': self.id})
@@ -71,7 +78,10 @@ class Referral(db.Model):
     date_referred = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='Pending')  # Pending, Completed, etc.
 
+    __table_args__ = (db.Index('ix_referral_referrer_id_date_referred', 'referrer_id', 'date_referred'),)
+
 class LoyaltyPoints(db.Model):
+    # Balance snapshot; LoyaltyTransaction is the source of truth.
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     points = db.Column(db.Integer, default=0)
@@ -79,6 +89,20 @@ class LoyaltyPoints(db.Model):
 
     user = db.relationship('User', backref=db.backref('loyalty_points', uselist=False))
 
+    __table_args__ = (db.UniqueConstraint('user_id', name='uq_loyalty_points_user_id'),)
+
+class LoyaltyTransaction(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'))
+    points = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(50), nullable=False)  # booking, redemption, adjustment, opening_balance
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    booking = db.relationship('Booking')
+
+    __table_args__ = (db.UniqueConstraint('booking_id', 'reason', name='uq_loyalty_transaction_booking_reason'),)
+
 class Feedback(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
@@ -89,3 +113,70 @@ class Feedback(db.Model):
 
     user = db.relationship('User', backref=db.backref('feedbacks', lazy=True))
     service = db.relationship('Service', backref=db.backref('feedbacks', lazy=True))
+
+    __table_args__ = (db.Index('ix_feedback_service_id_date_submitted', 'service_id', 'date_submitted'),)
+
+class ServiceRating(db.Model):
+    # Rollup of Feedback per service, maintained by ratings.RatingRollups.
+    service_id = db.Column(db.Integer, db.ForeignKey('service.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+    top_comments = db.Column(db.Text)  # JSON list of recent well-rated comments
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    service = db.relationship('Service', backref=db.backref('rating', uselist=False))
+
+    @property
+    def mean(self):
+        return self.rating_sum / self.count if self.count else None
+
+    @property
+    def histogram(self):
+        return [self.stars_1, self.stars_2, self.stars_3, self.stars_4, self.stars_5]
+
+class IdempotencyKey(db.Model):
+    key = db.Column(db.String(64), primary_key=True)
+    booking_ids = db.Column(db.String(500))  # Comma-separated ids of the bookings created
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class OutboundEmail(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    sender = db.Column(db.String(100))
+    recipients = db.Column(db.Text, nullable=False)  # Comma-separated addresses
+    subject = db.Column(db.String(200), nullable=False)
+    html = db.Column(db.Text)
+    body = db.Column(db.Text)
+    status = db.Column(db.String(20), default='queued', index=True)  # queued, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.String(500))
+    claim_token = db.Column(db.String(32), index=True)
+    claimed_at = db.Column(db.DateTime)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+class FollowUp(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # reminder, feedback
+    sent_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('booking_id', 'kind', name='uq_follow_up_booking_kind'),)
+
+class SchedulerLease(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100))
+    expires_at = db.Column(db.DateTime)
+
+class ChatConversation(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # The browser session's chat_session_id
+    agent = db.Column(db.String(20), nullable=False)
+    messages = db.Column(db.Text)  # JSON list of chat messages
+    summary = db.Column(db.Text)
+    facts = db.Column(db.Text)  # JSON object of pinned booking facts
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request, session
+from flask_login import current_user
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def deploy_version():
+    """Identifier of the running release, mixed into every ETag.
+
+    Without DEPLOY_VERSION (or the platform's commit id) it is a digest of
+    the templates and static files, which every worker of a release
+    computes alike, so their ETags match and survive restarts.
+    """
+    return (os.getenv('DEPLOY_VERSION') or os.getenv('HEROKU_SLUG_COMMIT') or os.getenv('SOURCE_VERSION')
+            or _source_digest())
+
+
+def _source_digest():
+    digest = hashlib.sha256()
+    for folder, read in (('templates', True), ('static', False)):
+        for directory, _, filenames in sorted(os.walk(os.path.join(ROOT, folder))):
+            for filename in sorted(filenames):
+                path = os.path.join(directory, filename)
+                digest.update(os.path.relpath(path, ROOT).encode('utf-8'))
+                # Template contents, but only the size of static files (images are large).
+                if read or filename.endswith('.json'):
+                    with open(path, 'rb') as f:
+                        digest.update(f.read())
+                else:
+                    digest.update(str(os.path.getsize(path)).encode('ascii'))
+    return digest.hexdigest()[:12]
+
+
+class PageCache:
+    """In-memory cache of rendered marketing pages.
+
+    Pages are keyed by endpoint and whether the visitor is logged in (the
+    only thing base.html varies on). Responses carry a strong ETag derived
+    from the body and the deploy version, so browsers revalidate with
+    If-None-Match and get a 304 after a hit. Entries expire
+    after PAGE_CACHE_TTL_SECONDS; a deploy starts with an empty cache and a
+    new version, which invalidates every ETag handed out before it. Pages
+    with pending flash messages are always rendered fresh.
+    """
+
+    def __init__(self, app=None):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.version = deploy_version()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PAGE_CACHE_ENABLED', True)
+        app.config.setdefault('PAGE_CACHE_TTL_SECONDS', 300)
+        app.config.setdefault('PAGE_CACHE_MAX_AGE_SECONDS', 60)
+        app.extensions['page_cache'] = self
+
+    def invalidate(self, endpoint=None):
+        """Drop cached pages for one endpoint, or every page."""
+        with self._lock:
+            if endpoint is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == endpoint]:
+                    del self._entries[key]
+
+    def _respond(self, body, etag, authenticated):
+        response = current_app.response_class(body, mimetype='text/html')
+        response.set_etag(etag)
+        if authenticated:
+            response.headers['Cache-Control'] = 'private, no-cache'
+        else:
+            response.headers['Cache-Control'] = f"public, max-age={current_app.config['PAGE_CACHE_MAX_AGE_SECONDS']}"
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+
+    def cached(self, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            config = current_app.config
+            if not config['PAGE_CACHE_ENABLED'] or request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            authenticated = current_user.is_authenticated
+            key = (request.endpoint, authenticated)
+            now = time.monotonic()
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return self._respond(entry[1], entry[2], authenticated)
+
+            self.misses += 1
+            body = view(*args, **kwargs)
+            if not isinstance(body, str):
+                return body
+            body = body.encode('utf-8')
+            etag = hashlib.sha256(self.version.encode('ascii') + body).hexdigest()[:32]
+            with self._lock:
+                self._entries[key] = (now + config['PAGE_CACHE_TTL_SECONDS'], body, etag)
+            return self._respond(body, etag, authenticated)
+        return wrapper
+
+
+page_cache = PageCache()
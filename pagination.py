@@ -0,0 +1,85 @@
+import base64
+import json
+from datetime import date, datetime
+
+from extensions import db
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor can't be decoded."""
+
+
+class KeysetPage:
+    """One page of results and the cursor for the page after it."""
+
+    __slots__ = ('items', 'next_cursor')
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+
+def _encode_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type in (date, datetime):
+        return python_type.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(sort_value, row_id):
+    payload = json.dumps([_encode_value(sort_value), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort_column):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return _decode_value(sort_column, sort_value), int(row_id)
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def keyset_page(query, sort_column, id_column, cursor=None, limit=20):
+    """Return a KeysetPage of `query` ordered newest first by (sort_column, id).
+
+    Instead of OFFSET, each page continues strictly after the last row of
+    the previous one with a row-value comparison, `(sort_column, id) <
+    (last value, last id)`, which the database answers with a range seek on
+    an index over (filter, sort_column), so every page costs the same
+    however deep into the history it is. Rows with a NULL sort value come
+    last: once the dated rows run out, the page is filled from them in a
+    second query ordered by id alone.
+    """
+    sort_value, last_id = decode_cursor(cursor, sort_column) if cursor else (None, None)
+
+    rows = []
+    if last_id is None or sort_value is not None:
+        dated = query.filter(sort_column.isnot(None)).order_by(sort_column.desc(), id_column.desc())
+        if last_id is not None:
+            dated = dated.filter(db.tuple_(sort_column, id_column) < (sort_value, last_id))
+        rows = dated.limit(limit + 1).all()
+        last_id = None
+
+    if len(rows) <= limit:
+        undated = query.filter(sort_column.is_(None)).order_by(id_column.desc())
+        if last_id is not None:
+            undated = undated.filter(id_column < last_id)
+        rows += undated.limit(limit + 1 - len(rows)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return KeysetPage(rows, next_cursor)
@@ -0,0 +1,88 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when no hashing slot frees up within PASSWORD_HASH_TIMEOUT_SECONDS."""
+
+
+def _check(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+def _generate(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def hash_method(pwhash):
+    """The werkzeug method prefix of a stored hash, e.g. 'scrypt:32768:8:1'."""
+    return (pwhash or '').split('$', 1)[0]
+
+
+class PasswordHasher:
+    """Runs password hashing off the request thread with a concurrency cap.
+
+    Hashes are computed on a bounded pool (threads by default: hashlib's
+    scrypt and pbkdf2 release the GIL; set PASSWORD_HASH_POOL='process' to
+    use processes instead). At most PASSWORD_HASH_MAX_PENDING hashes may be
+    queued or running per process; a request that can't get a slot within
+    PASSWORD_HASH_TIMEOUT_SECONDS gets HashingBusy rather than tying up a
+    server thread behind a login spike.
+    """
+
+    def __init__(self, app=None):
+        self.method = 'scrypt'
+        self._executor = None
+        self._executor_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        workers = os.cpu_count() or 1
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+        app.config.setdefault('PASSWORD_HASH_POOL', 'thread')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', workers)
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', workers * 4)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT_SECONDS', 5)
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.pool = app.config['PASSWORD_HASH_POOL']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT_SECONDS']
+        self._slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_MAX_PENDING'])
+        app.extensions['password_hasher'] = self
+
+    @property
+    def executor(self):
+        # Pools don't survive fork, so each gunicorn worker builds its own.
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    pool_cls = ProcessPoolExecutor if self.pool == 'process' else ThreadPoolExecutor
+                    self._executor = pool_cls(self.workers)
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingBusy("Too many sign-ins in progress, please try again.")
+        try:
+            return self.executor.submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def generate(self, password):
+        return self._run(_generate, password, self.method)
+
+    def check(self, pwhash, password):
+        return self._run(_check, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return hash_method(pwhash) != self.method
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,116 @@
+from datetime import date as date_cls, timedelta
+
+from bookings import parse_date
+from service_catalog import service_catalog
+
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+class QuoteEngine:
+    """Prices a cart of services over many dates and durations at once.
+
+    A quote is one NumPy broadcast of date multiplier x hours x hourly rate
+    over a (dates, durations, services) grid, so a month of options costs
+    about the same as one. Rates and default hours come from the service
+    catalog; a date's multiplier is its QUOTE_WEEKDAY_MULTIPLIERS entry
+    (Monday first) times QUOTE_PEAK_MULTIPLIER in QUOTE_PEAK_MONTHS.
+    Quotes without dates use the base rate.
+
+    numpy is imported on the first quote, keeping it out of app startup.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('QUOTE_WEEKDAY_MULTIPLIERS', (1.0, 1.0, 1.0, 1.0, 1.0, 1.15, 1.25))
+        app.config.setdefault('QUOTE_PEAK_MONTHS', (5, 6, 7, 8))
+        app.config.setdefault('QUOTE_PEAK_MULTIPLIER', 1.1)
+        app.config.setdefault('QUOTE_MAX_DAYS', 90)
+        app.config.setdefault('QUOTE_MAX_DURATIONS', 12)
+        self.app = app
+        app.extensions['quote_engine'] = self
+
+    def resolve(self, services):
+        """Map service ids or names to catalog entries; raise ValueError for unknown ones."""
+        resolved = []
+        for service in services:
+            entry = service_catalog.get(service) if str(service).strip().isdigit() else service_catalog.find(service)
+            if entry is None:
+                raise ValueError(f"Service {service} not found")
+            resolved.append(entry)
+        if not resolved:
+            raise ValueError('Choose at least one service')
+        return resolved
+
+    def date_range(self, start=None, days=7):
+        start = parse_date(start) if start else date_cls.today()
+        return [start + timedelta(days=offset) for offset in range(days)]
+
+    def multipliers(self, dates):
+        """Price multiplier for each date, as a float array."""
+        import numpy as np
+
+        config = self.app.config
+        days = np.array([parse_date(day).isoformat() for day in dates], dtype='datetime64[D]')
+        # 1970-01-01 was a Thursday.
+        weekdays = (days.astype('int64') + 3) % 7
+        months = days.astype('datetime64[M]').astype('int64') % 12 + 1
+        multipliers = np.asarray(config['QUOTE_WEEKDAY_MULTIPLIERS'], dtype=float)[weekdays]
+        return np.where(np.isin(months, config['QUOTE_PEAK_MONTHS']),
+                        multipliers * config['QUOTE_PEAK_MULTIPLIER'], multipliers)
+
+    def quote(self, services, dates=None, hours=None):
+        """Price `services` (ids or names) on each of `dates` for each of `hours`.
+
+        With no `hours`, every service is priced for its own default
+        duration. Returns a dict with the services and one option per
+        (date, hours) pair, each with per-service lines and a total, plus
+        the cheapest option.
+        """
+        import numpy as np
+
+        config = self.app.config
+        services = self.resolve(services)
+        dates = [parse_date(day) for day in dates] if dates else [None]
+        if len(dates) > config['QUOTE_MAX_DAYS']:
+            raise ValueError(f"Quote at most {config['QUOTE_MAX_DAYS']} dates at once")
+        if hours:
+            hours = [int(value) for value in hours]
+            if len(hours) > config['QUOTE_MAX_DURATIONS'] or min(hours) < 1:
+                raise ValueError(f"Quote between 1 and {config['QUOTE_MAX_DURATIONS']} durations of at least an hour")
+            hour_grid = np.repeat(np.array(hours, dtype=float)[:, None], len(services), axis=1)
+        else:
+            hour_grid = np.array([[service.duration or 1 for service in services]], dtype=float)
+
+        rates = np.array([service.price_per_hour for service in services], dtype=float)
+        multipliers = self.multipliers(dates) if dates[0] is not None else np.ones(1)
+
+        # (dates, durations, services)
+        lines = np.round(multipliers[:, None, None] * hour_grid[None, :, :] * rates[None, None, :], 2)
+        totals = np.round(lines.sum(axis=2), 2)
+
+        options = []
+        for d, day in enumerate(dates):
+            for h in range(hour_grid.shape[0]):
+                options.append({
+                    'date': day.isoformat() if day is not None else None,
+                    'weekday': WEEKDAYS[day.weekday()] if day is not None else None,
+                    'hours': int(hour_grid[h, 0]) if hours else None,
+                    'multiplier': round(float(multipliers[d]), 4),
+                    'lines': [{'service': service.name, 'hours': int(hour_grid[h, s]), 'subtotal': float(lines[d, h, s])}
+                              for s, service in enumerate(services)],
+                    'total': float(totals[d, h]),
+                })
+        cheapest = int(np.argmin(totals))
+        return {
+            'services': [{'id': service.id, 'name': service.name, 'price_per_hour': service.price_per_hour,
+                          'duration': service.duration} for service in services],
+            'options': options,
+            'cheapest': options[cheapest],
+        }
+
+
+quote_engine = QuoteEngine()
@@ -0,0 +1,187 @@
+import json
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from models import Feedback, ServiceRating, User
+
+RATINGS = (1, 2, 3, 4, 5)
+
+ratings_cli = AppGroup('ratings', help='Service rating rollups.')
+
+
+def parse_rating(value):
+    """Return a 1-5 rating as an int, or raise ValueError."""
+    rating = int(value)
+    if rating not in RATINGS:
+        raise ValueError(f"Rating must be between 1 and 5, got {rating}")
+    return rating
+
+
+def display_name(user):
+    """'Sarah M.' style attribution for a testimonial."""
+    if user is None or not user.name:
+        return 'A customer'
+    parts = user.name.split()
+    return f"{parts[0]} {parts[-1][0]}." if len(parts) > 1 else parts[0]
+
+
+def _comment_entry(feedback, user):
+    return {
+        'comment': feedback.comment.strip(),
+        'rating': int(feedback.rating),
+        'name': display_name(user),
+        'date': feedback.date_submitted.date().isoformat() if feedback.date_submitted else None,
+    }
+
+
+class RatingRollups:
+    """Per-service rating aggregates, precomputed from Feedback.
+
+    Each feedback insert bumps its service's ServiceRating row (count, sum
+    and the histogram bucket) with one atomic UPDATE in the same
+    transaction, and prepends the comment to the row's short list of recent
+    top comments if it is rated RATINGS_TOP_COMMENT_MIN_RATING or better.
+    The pages that show ratings read only these rows, so their cost doesn't
+    grow with the number of reviews. rebuild() recomputes every rollup from
+    Feedback; it runs every RATINGS_REBUILD_INTERVAL_SECONDS and from
+    `flask ratings rebuild`, and repairs anything the incremental path
+    raced on (two comments landing at once can drop one from the list).
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, scheduler=None):
+        app.config.setdefault('RATINGS_TOP_COMMENTS', 3)
+        app.config.setdefault('RATINGS_TOP_COMMENT_MIN_RATING', 4)
+        app.config.setdefault('RATINGS_REBUILD_INTERVAL_SECONDS', 3600)
+        self.app = app
+        app.extensions['rating_rollups'] = self
+        app.cli.add_command(ratings_cli)
+        if scheduler is not None and app.config['RATINGS_REBUILD_INTERVAL_SECONDS']:
+            scheduler.add_job(
+                self.run, 'interval',
+                seconds=app.config['RATINGS_REBUILD_INTERVAL_SECONDS'],
+                id='ratings-rebuild', replace_existing=True, max_instances=1, coalesce=True,
+            )
+
+    # Incremental updates
+
+    def record(self, feedback):
+        """Fold a new Feedback into its service's rollup; the caller commits."""
+        rating = int(feedback.rating)
+        if not self._increment(feedback.service_id, rating):
+            try:
+                with db.session.begin_nested():
+                    db.session.add(ServiceRating(service_id=feedback.service_id, count=0, rating_sum=0,
+                                                 stars_1=0, stars_2=0, stars_3=0, stars_4=0, stars_5=0))
+            except IntegrityError:
+                pass
+            self._increment(feedback.service_id, rating)
+
+        config = current_app.config
+        if feedback.comment and feedback.comment.strip() and rating >= config['RATINGS_TOP_COMMENT_MIN_RATING']:
+            rollup = db.session.get(ServiceRating, feedback.service_id)
+            comments = json.loads(rollup.top_comments or '[]')
+            feedback.date_submitted = feedback.date_submitted or datetime.utcnow()
+            user = db.session.get(User, feedback.user_id) if feedback.user_id else None
+            comments.insert(0, _comment_entry(feedback, user))
+            rollup.top_comments = json.dumps(comments[:config['RATINGS_TOP_COMMENTS']])
+
+    def _increment(self, service_id, rating):
+        bucket = f"stars_{rating}"
+        return ServiceRating.query.filter_by(service_id=service_id).update({
+            'count': ServiceRating.count + 1,
+            'rating_sum': ServiceRating.rating_sum + rating,
+            bucket: getattr(ServiceRating, bucket) + 1,
+            'updated_at': datetime.utcnow(),
+        }, synchronize_session='fetch')
+
+    # Full rebuild
+
+    def rebuild(self):
+        """Recompute every service's rollup from Feedback; return the number of rollups."""
+        config = current_app.config
+        rating = db.cast(Feedback.rating, db.Integer)
+        rollups = {}
+        counts = (
+            db.session.query(Feedback.service_id, rating, db.func.count(Feedback.id))
+            .group_by(Feedback.service_id, rating)
+        )
+        for service_id, value, count in counts:
+            if value not in RATINGS:
+                continue
+            rollup = rollups.setdefault(service_id, {'count': 0, 'rating_sum': 0, 'top_comments': '[]',
+                                                     **{f"stars_{r}": 0 for r in RATINGS}})
+            rollup['count'] += count
+            rollup['rating_sum'] += value * count
+            rollup[f"stars_{value}"] = count
+
+        for service_id, rollup in rollups.items():
+            recent = (
+                db.session.query(Feedback, User)
+                .outerjoin(User, User.id == Feedback.user_id)
+                .filter(Feedback.service_id == service_id, rating >= config['RATINGS_TOP_COMMENT_MIN_RATING'],
+                        Feedback.comment.isnot(None), db.func.trim(Feedback.comment) != '')
+                .order_by(Feedback.date_submitted.desc(), Feedback.id.desc())
+                .limit(config['RATINGS_TOP_COMMENTS'])
+            )
+            rollup['top_comments'] = json.dumps([_comment_entry(feedback, user) for feedback, user in recent])
+
+        now = datetime.utcnow()
+        ServiceRating.query.filter(ServiceRating.service_id.notin_(rollups)).delete(synchronize_session=False)
+        for service_id, rollup in rollups.items():
+            db.session.merge(ServiceRating(service_id=service_id, updated_at=now, **rollup))
+        db.session.commit()
+        return len(rollups)
+
+    def run(self):
+        """Scheduler entry point."""
+        app = self.app
+        with app.app_context():
+            try:
+                self.rebuild()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Rating rollup rebuild failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+    # Reads
+
+    def summaries(self):
+        """Rollups for every rated service, most reviewed first, as plain dicts."""
+        rows = (
+            ServiceRating.query
+            .options(joinedload(ServiceRating.service))
+            .filter(ServiceRating.count > 0)
+            .order_by(ServiceRating.count.desc())
+        )
+        return [{
+            'service': row.service.name,
+            'count': row.count,
+            'mean': round(row.mean, 1),
+            'histogram': row.histogram,
+            'top_comments': json.loads(row.top_comments or '[]'),
+        } for row in rows]
+
+    def by_service_name(self):
+        return {summary['service'].lower(): summary for summary in self.summaries()}
+
+
+@ratings_cli.command('rebuild')
+def rebuild_command():
+    """Recompute every service's rating rollup from Feedback."""
+    count = rating_rollups.rebuild()
+    click.echo(f"Rebuilt rating rollups for {count} services.")
+
+
+rating_rollups = RatingRollups()
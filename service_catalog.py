@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from extensions import db, register_session_hooks
+from models import Service
+
+CatalogService = namedtuple('CatalogService', 'id name description price_per_hour duration image')
+
+
+class CatalogSnapshot:
+    """One immutable copy of the Service table, indexed by id and by name."""
+
+    __slots__ = ('services', 'by_id', 'by_name', 'version')
+
+    def __init__(self, services):
+        self.services = tuple(sorted(services, key=lambda service: service.id))
+        self.by_id = MappingProxyType({service.id: service for service in self.services})
+        self.by_name = MappingProxyType({service.name.strip().lower(): service for service in self.services})
+        # A digest of the rows, so every worker holding the same catalog reports the same version.
+        self.version = hashlib.sha256(repr(self.services).encode('utf-8')).hexdigest()[:12]
+
+
+class ServiceCatalog:
+    """Process-wide snapshot of the services on offer.
+
+    Views, agent tools and booking code look services up here instead of
+    querying: `get(id)`, `find(name)` and `all()` are dictionary reads on
+    a CatalogSnapshot of plain namedtuples, which is swapped whole, never
+    mutated, so threads can share it without locking. A committed insert,
+    update or delete of a Service through the ORM drops this worker's
+    snapshot at once; every worker also reloads when its snapshot is older
+    than SERVICE_CATALOG_REFRESH_SECONDS, which is how edits made by other
+    workers (or outside the app) reach it.
+
+    Each invalidation bumps a generation counter, and `load` only installs
+    its snapshot if the generation is unchanged since it started reading,
+    so a load that raced a commit can't put the old rows back.
+    """
+
+    def __init__(self, app=None):
+        self._snapshot = None
+        self._loaded_at = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.refresh_seconds = 30
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SERVICE_CATALOG_REFRESH_SECONDS', 30)
+        self.refresh_seconds = app.config['SERVICE_CATALOG_REFRESH_SECONDS']
+        app.extensions['service_catalog'] = self
+        _register_session_hooks(self)
+
+    def load(self):
+        """Read the Service table into a new snapshot and return it."""
+        generation = self._generation
+        rows = db.session.query(Service.id, Service.name, Service.description, Service.price_per_hour,
+                                Service.duration, Service.image)
+        snapshot = CatalogSnapshot(CatalogService(*row) for row in rows)
+        with self._lock:
+            # Invalidated while reading: these rows may predate the change.
+            if generation == self._generation:
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+        return snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._loaded_at = None
+
+    def snapshot(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or (self.refresh_seconds and time.monotonic() - loaded_at > self.refresh_seconds):
+            return self.load()
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self.snapshot().version
+
+    # Lookups
+
+    def all(self):
+        return self.snapshot().services
+
+    def get(self, service_id):
+        """The service with this id, or None."""
+        try:
+            return self.snapshot().by_id.get(int(service_id))
+        except (TypeError, ValueError):
+            return None
+
+    def find(self, name):
+        """The service with this name (case-insensitive), or None."""
+        return self.snapshot().by_name.get(str(name).strip().lower())
+
+
+def _register_session_hooks(catalog):
+    def collect_service_changes(session, flush_context):
+        if any(isinstance(obj, Service) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+            session.info['service_catalog_changed'] = True
+
+    def reload_changed_catalog(session):
+        if session.info.pop('service_catalog_changed', False):
+            catalog.invalidate()
+
+    def discard_service_changes(session):
+        session.info.pop('service_catalog_changed', None)
+
+    register_session_hooks('service_catalog', catalog,
+                           after_flush=collect_service_changes,
+                           after_commit=reload_changed_catalog,
+                           after_rollback=discard_service_changes)
+
+
+service_catalog = ServiceCatalog()
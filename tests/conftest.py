@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# create_app reads its configuration from the environment at import time.
+_database = os.path.join(tempfile.mkdtemp(prefix='marquise-tests-'), 'test.db')
+os.environ['DATABASE_URL'] = f"sqlite:///{_database}"
+os.environ.setdefault('SECRET_KEY', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+
+@pytest.fixture
+def app():
+    from app import app, create_sample_services
+    from extensions import db
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        create_sample_services()
+    yield app
+    app.extensions['mail_queue'].stop()
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+    for name in ('service_catalog', 'availability_index'):
+        app.extensions[name].invalidate()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,50 @@
+from datetime import date, time, timedelta
+
+import availability
+from availability import availability_index
+from extensions import db
+from models import Booking, Service
+
+
+def book(service_id, day, at=time(9)):
+    db.session.add(Booking(service_id=service_id, email='x@example.com', date=day, time=at))
+    db.session.commit()
+
+
+def test_rebuild_reads_only_from_today(app):
+    with app.app_context():
+        moving = Service.query.filter_by(name='Moving').one()
+        book(moving.id, date.today() - timedelta(days=30))
+        tomorrow = date.today() + timedelta(days=1)
+        book(moving.id, tomorrow)
+
+        availability_index.rebuild()
+        assert list(availability_index._days) == [(moving.id, tomorrow)]
+        assert availability_index.day_summary('Moving', tomorrow)['booked'] == 1
+        assert not availability_index.is_available('Moving', date.today() - timedelta(days=1))
+
+
+def test_booking_committed_during_rebuild_is_counted_once(app, monkeypatch):
+    with app.app_context():
+        moving = Service.query.filter_by(name='Moving').one()
+        tomorrow = date.today() + timedelta(days=1)
+        book(moving.id, tomorrow)
+        availability_index.rebuild()
+
+        racing = [True]
+
+        class RacingSlots(availability.DaySlots):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                if racing:
+                    racing.pop()
+                    # Committed after the rebuild read its rows, before it swaps them in.
+                    book(moving.id, tomorrow, time(10))
+
+        monkeypatch.setattr(availability, 'DaySlots', RacingSlots)
+        availability_index.rebuild()
+        monkeypatch.undo()
+
+        assert availability_index.day_summary('Moving', tomorrow)['booked'] == 2
+        availability_index.rebuild()
+        assert availability_index.day_summary('Moving', tomorrow)['booked'] == 2
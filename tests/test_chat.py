@@ -0,0 +1,76 @@
+import json
+import os
+import time
+from types import SimpleNamespace
+
+from chat_agents import chat_agents
+from chat_sessions import BOOKING_AGENT
+from models import Booking, ChatConversation
+
+
+class FakeSwarm:
+    """Asks for two tools on the first turn, then answers in text."""
+
+    def __init__(self, tool_calls):
+        self.tool_calls = tool_calls
+
+    def run(self, agent, messages, stream, execute_tools):
+        if messages[-1]['role'] == 'user':
+            message = {'role': 'assistant', 'content': None, 'tool_calls': self.tool_calls}
+        else:
+            yield {'content': 'Booked!'}
+            message = {'role': 'assistant', 'content': 'Booked!'}
+        yield {'response': SimpleNamespace(messages=[message])}
+
+
+def tool_call(id, name, **arguments):
+    return {'id': id, 'type': 'function', 'function': {'name': name, 'arguments': json.dumps(arguments)}}
+
+
+def saved_messages(app, timeout=10):
+    """The stored conversation once its tool round has been recorded."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with app.app_context():
+            row = ChatConversation.query.first()
+            messages = json.loads(row.messages) if row is not None else []
+        if any(message['role'] == 'tool' for message in messages):
+            return messages
+        time.sleep(0.05)
+    return messages
+
+
+def test_closing_stream_mid_tool_round_keeps_history_valid(app, client, monkeypatch):
+    agent = chat_agents.get(BOOKING_AGENT)
+
+    def quote_services(**arguments):
+        time.sleep(0.5)
+        return 'Moving: $200.00'
+
+    functions = [quote_services if function.__name__ == 'quote_services' else function
+                 for function in agent.functions]
+    monkeypatch.setattr(agent, 'functions', functions)
+    monkeypatch.setattr(chat_agents, '_client', FakeSwarm([
+        tool_call('call-book', 'book_service', service='Moving', email='x@example.com', date='2030-02-02',
+                  time='09:00'),
+        tool_call('call-quote', 'quote_services', services=['Moving'], start_date='2030-02-02'),
+    ]))
+    monkeypatch.setattr(chat_agents, '_client_pid', os.getpid())
+
+    response = client.post('/chat', json={'message': 'I want to book moving'}, buffered=False)
+    events = iter(response.response)
+    first = json.loads(next(events))
+    assert first['type'] == 'tool_call'
+    response.close()
+
+    messages = saved_messages(app)
+    assert [message['role'] for message in messages] == ['user', 'assistant', 'tool', 'tool']
+    assert {message['tool_call_id'] for message in messages[2:]} == {'call-book', 'call-quote'}
+    quote = next(message for message in messages[2:] if message['tool_call_id'] == 'call-quote')
+    assert quote['content'] == 'Moving: $200.00'
+    with app.app_context():
+        assert Booking.query.count() == 1
+
+    # The next turn continues from a history the model API accepts.
+    response = client.post('/chat', json={'message': 'Thanks'})
+    assert '"done"' in response.get_data(as_text=True)
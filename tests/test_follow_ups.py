@@ -0,0 +1,40 @@
+import threading
+from datetime import date, time, timedelta
+
+from sqlalchemy import event
+
+from extensions import db
+from follow_ups import follow_ups
+from mail_queue import mail_queue
+from models import Booking, FollowUp, OutboundEmail, Service
+
+
+def test_sweep_query_count_does_not_grow_per_booking(app, monkeypatch):
+    monkeypatch.setattr(mail_queue, 'start', lambda: None)
+    tomorrow = date.today() + timedelta(days=1)
+    with app.app_context():
+        service_ids = [service.id for service in Service.query.all()]
+        db.session.add_all(
+            Booking(service_id=service_ids[i % len(service_ids)], email=f"customer{i}@example.com",
+                    date=tomorrow, time=time(9 + i % 8))
+            for i in range(200)
+        )
+        db.session.commit()
+
+        statements = []
+        sweep_thread = threading.get_ident()
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if threading.get_ident() == sweep_thread:
+                statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            assert follow_ups.sweep() == 200
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        assert FollowUp.query.count() == 200
+        assert OutboundEmail.query.count() == 200
+        # Two selects, then one INSERT each for the FollowUp and email of every group.
+        assert len(statements) <= 2 + 2 * 200
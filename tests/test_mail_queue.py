@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from extensions import db
+from mail_queue import mail_queue
+from models import OutboundEmail
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+import fake_smtp  # noqa: E402
+
+
+def test_drain_job_sends_mail_left_queued_by_a_previous_process(app, monkeypatch):
+    server = fake_smtp.serve(delay_ms=0)
+    monkeypatch.setitem(app.config, 'MAIL_SERVER', '127.0.0.1')
+    monkeypatch.setitem(app.config, 'MAIL_PORT', server.server_address[1])
+    monkeypatch.setitem(app.config, 'MAIL_USE_TLS', False)
+    monkeypatch.setitem(app.config, 'MAIL_USERNAME', None)
+    try:
+        with app.app_context():
+            db.session.add_all(
+                OutboundEmail(recipients=f"customer{i}@example.com", subject='Reminder', body='See you tomorrow',
+                              sender='noreply@example.com', status='queued', attempts=0,
+                              next_attempt_at=datetime.utcnow() - timedelta(minutes=i))
+                for i in range(5)
+            )
+            db.session.commit()
+
+        assert 'mail-queue-drain' in app.extensions['background_jobs']._jobs
+        mail_queue.run()
+
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            with app.app_context():
+                sent = OutboundEmail.query.filter_by(status='sent').count()
+                db.session.remove()
+            if sent == 5:
+                break
+            time.sleep(0.05)
+        assert sent == 5
+    finally:
+        mail_queue.stop()
+        server.shutdown()
@@ -1,9 +1,9 @@
 from functools import wraps
-from extensions import db, mail
-from models import Availability, Service, Booking
-from flask_mail import Message
-from datetime import datetime
-from flask import render_template, current_app
+from flask import render_template
+from availability import availability_index
+from service_catalog import service_catalog
+from quotes import quote_engine
+from mail_queue import mail_queue
 
 def tool(func):
     @wraps(func)
@@ -14,26 +14,43 @@ def tool(func):
 
 @tool
 def check_availability(service_name: str, date: str) -> str:
-    service = Service.query.filter_by(name=service_name).first()
-    if not service:
+    if availability_index.resolve_service(service_name) is None:
         return f"Service {service_name} not found."
 
-    date_obj = datetime.strptime(date, "%Y-%m-%d")
-    bookings = Booking.query.filter_by(service=service_name, date=date).count()
-    if bookings >= 3:  # Assuming a maximum of 3 bookings per day per service
+    if not availability_index.is_available(service_name, date):
         return f"No available slots for {service_name} on {date}."
-    
+
     return f"Available slots for {service_name} on {date}."
 
 @tool
 def calculate_estimate(service_name: str, hours: int) -> str:
-    service = Service.query.filter_by(name=service_name).first()
+    service = service_catalog.find(service_name)
     if not service:
         return f"Service {service_name} not found."
 
-    cost = hours * service.price_per_hour
+    try:
+        cost = quote_engine.quote([service.id], hours=[hours])['cheapest']['total']
+    except ValueError as e:
+        return str(e)
     return f"The estimated cost for {hours} hours of {service.name} is ${cost}."
 
+@tool
+def quote_services(services: list, start_date: str, days: int = 7, hours: int = 0) -> str:
+    """Price several services together on each of `days` dates from start_date (YYYY-MM-DD).
+
+    With hours 0 each service is quoted for its usual duration.
+    """
+    try:
+        result = quote_engine.quote(services, quote_engine.date_range(start_date, min(days, 31)),
+                                    [hours] if hours else None)
+    except ValueError as e:
+        return str(e)
+
+    names = ', '.join(service['name'] for service in result['services'])
+    options = '; '.join(f"{option['weekday']} {option['date']}: ${option['total']:.2f}" for option in result['options'])
+    cheapest = result['cheapest']
+    return f"Quote for {names}: {options}. Cheapest is {cheapest['date']} at ${cheapest['total']:.2f}."
+
 @tool
 def send_confirmation_email(email: str, services: list, date: str, time: str) -> str:
     subject = "Booking Confirmation - Marquise's Services"
@@ -42,10 +59,9 @@ def send_confirmation_email(email: str, services: list, date: str, time: str) ->
     html_content = render_template('email_templates/booking_confirmation.html', 
                                    services=services, date=date, time=time)
     
-    msg = Message(subject, recipients=[email], html=html_content)
-    mail.send(msg)
+    mail_queue.enqueue(subject, [email], html=html_content)
     
-    return f"Confirmation email sent to {email} for services on {date} at {time}."
+    return f"Confirmation email queued to {email} for services on {date} at {time}."
 
 send_confirmation_email.schema = {
     "type": "function",